@@ -0,0 +1,231 @@
+"""
+Headless benchmarks for the import time and the slicing, rescaling and frame update paths of both backends.
+Run from the repository root:
+    python -m benchmarks.benchmark [--quick] [--output results.json]
+Every result is printed as one JSON object per line (and optionally written to --output as a JSON list), so runs can
+be diffed or tracked for regressions. The Qt benchmarks are skipped if pyqtgraph is not installed.
+"""
+import argparse
+import contextlib
+import functools
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import matplotlib
+
+matplotlib.use('Agg')
+
+from matplotlib import pyplot as plt
+
+from src.AnimatedFigure import AnimatedFigure
+from src.mpl_helpers import TimedAnimation
+from src.data_slicer import data_slicer
+from src.ring_buffer import RingBuffer
+from src.stats import FrameStats
+
+INPUT_TYPES = ('list', 'deque', 'ndarray', 'RingBuffer')
+# modules timed by bench_import, pyplot for reference
+IMPORTS = ('src.ring_buffer', 'src.stream_source', 'src.shared_source', 'src.AnimatedFigure', 'matplotlib.pyplot')
+
+
+class Source:
+    """
+    data_function that appends one sample per line and subplot every frame, storing the data as input_type.
+    """
+
+    def __init__(self, input_type, subplots, lines, window):
+        self.input_type = input_type
+        self.subplots = subplots
+        self.lines = lines
+        self.window = window
+        # one long precomputed signal, frames walk along it
+        self.signal = np.sin(np.arange(window + 10000) / 50) * np.arange(window + 10000) / 100
+        self.n = window
+        if input_type == 'list':
+            self.series = [[list(self.signal[:window]) for _ in range(lines + 1)] for _ in range(subplots)]
+        elif input_type == 'deque':
+            self.series = [[deque(self.signal[:window], maxlen=window) for _ in range(lines + 1)]
+                           for _ in range(subplots)]
+        elif input_type == 'RingBuffer':
+            self.series = [[RingBuffer(window, track_extrema=i > 0) for i in range(lines + 1)] for _ in range(subplots)]
+            for buffer in itertools.chain.from_iterable(self.series):
+                buffer.extend(self.signal[:window])
+
+    def __call__(self, idx):
+        value = self.signal[self.n % len(self.signal)]
+        self.n += 1
+        if self.input_type == 'ndarray':
+            start = self.n % (len(self.signal) - self.window)
+            view = self.signal[start:start + self.window]
+            return [tuple(view for _ in range(self.lines + 1)) for _ in range(self.subplots)]
+        for plot in self.series:
+            for series in plot:
+                series.append(value)
+            if self.input_type == 'list' and len(plot[0]) > 2 * self.window:
+                # keep lists from growing forever, like a producer would
+                for series in plot:
+                    del series[:self.window]
+        return self.series
+
+
+def timeit(function, frames):
+    start = time.perf_counter()
+    for idx in range(frames):
+        function(idx)
+    return (time.perf_counter() - start) / frames
+
+
+def make_figure(source, case, **kwargs):
+    # The figure reports backend quirks with print(), keep stdout clean for the JSON results
+    with contextlib.redirect_stdout(sys.stderr):
+        return AnimatedFigure(source, plot_samples=case['window'], backend='Agg', **kwargs)
+
+
+def bench_import(module, repeats):
+    # Every import runs in a fresh interpreter, so nothing is cached in sys.modules yet
+    code = ('import sys, time; start = time.perf_counter(); import ' + module +
+            '; print(time.perf_counter() - start, "matplotlib" in sys.modules)')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    timings = []
+    for _ in range(repeats):
+        seconds, matplotlib_loaded = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True,
+                                                    text=True, check=True).stdout.split()
+        timings.append(float(seconds))
+    return {'best_ms': min(timings) * 1000, 'median_ms': float(np.median(timings)) * 1000,
+            'imports_matplotlib': matplotlib_loaded == 'True'}
+
+
+def bench_data_slicer(case, frames):
+    source = Source(**case)
+    frame = source(0)
+
+    def run(_):
+        for x, *y_points in frame:
+            data_slicer(case['window'], x, y_points)
+    return {'us_per_frame': timeit(run, frames) * 1e6}
+
+
+def bench_rescale(case, frames):
+    source = Source(**case)
+    sliced = [data_slicer(case['window'], x, y_points) for x, *y_points in source(0)]
+    an = make_figure(source, case)
+
+    def calc(_):
+        for _, y_points in sliced:
+            AnimatedFigure._calc_y_labels(y_points)
+
+    def calc_buffers(_):
+        for _, *y_points in source.series:
+            AnimatedFigure._calc_y_labels(y_points)
+
+    def update(_):
+        for ax, (_, y_points) in zip(an.axes, sliced):
+            an._update_y_labels(ax, y_points)
+    result = {'calc_y_labels_us': timeit(calc, frames) * 1e6, 'update_y_labels_us': timeit(update, frames) * 1e6}
+    if case['input_type'] == 'RingBuffer':
+        result['calc_y_labels_extrema_us'] = timeit(calc_buffers, frames) * 1e6
+    plt.close(an.fig)
+    return result
+
+
+def bench_mpl(case, frames, **kwargs):
+    stats = FrameStats()
+    an = make_figure(Source(**case), case, stats=stats, **kwargs)
+    ani = TimedAnimation(fig=an.fig, func=an.update_plots, stats=stats, frames=itertools.count(start=1), blit=True,
+                         cache_frame_data=False)
+    an.fig.canvas.draw()
+    ani._init_draw()
+    start = time.perf_counter()
+    for idx in range(1, frames + 1):
+        # Same sequence of steps as a timer tick of the animation: update_plots, then blit
+        ani._draw_next_frame(idx, blit=True)
+    elapsed = time.perf_counter() - start
+    ani.event_source.stop()
+    plt.close(an.fig)
+    return _frame_result(frames / elapsed, stats)
+
+
+def bench_qt(case, frames, **kwargs):
+    from src.AnimatedFigureQt import AnimatedFigure as AnimatedFigureQt
+    stats = FrameStats()
+    source = Source(**case)
+    an = AnimatedFigureQt(source, plot_samples=case['window'], stats=stats, **kwargs)
+    an.create_curves()
+    start = time.perf_counter()
+    for idx in range(1, frames + 1):
+        an.update(source(idx))
+        an.app.processEvents()  # let pyqtgraph repaint
+    elapsed = time.perf_counter() - start
+    an.win.close()
+    return _frame_result(frames / elapsed, stats)
+
+
+def _frame_result(fps, stats):
+    snapshot = stats.snapshot()
+    return {'fps': fps,
+            'frame_time_p50_ms': snapshot['frame_time']['p50'],
+            'frame_time_p99_ms': snapshot['frame_time']['p99'],
+            'stages_mean_ms': {stage: summary['mean'] for stage, summary in snapshot['stages'].items()}}
+
+
+def qt_available():
+    try:
+        import pyqtgraph  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quick', action='store_true', help='small grid and few frames, for smoke testing')
+    parser.add_argument('--output', help='also write all results to this file as a JSON list')
+    parser.add_argument('--only', nargs='+', help='only run these benchmarks')
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        grid = {'subplots': (1, 4), 'lines': (1, 5), 'window': (400, )}
+        frames = {'import': 3, 'data_slicer': 50, 'rescale': 50, 'mpl': 20, 'mpl_batched': 20, 'qt': 20,
+                  'qt_batched': 20}
+    else:
+        grid = {'subplots': (1, 4, 10), 'lines': (1, 5, 10), 'window': (400, 10000)}
+        frames = {'import': 10, 'data_slicer': 500, 'rescale': 500, 'mpl': 200, 'mpl_batched': 200, 'qt': 200,
+                  'qt_batched': 200}
+    benchmarks = {'data_slicer': bench_data_slicer, 'rescale': bench_rescale, 'mpl': bench_mpl,
+                  'mpl_batched': functools.partial(bench_mpl, batched=True)}
+    if qt_available():
+        benchmarks['qt'] = bench_qt
+        benchmarks['qt_batched'] = functools.partial(bench_qt, batched=True)
+    if args.only:
+        benchmarks = {name: benchmark for name, benchmark in benchmarks.items() if name in args.only}
+
+    results = []
+    if not args.only or 'import' in args.only:
+        for module in IMPORTS:
+            result = {'benchmark': 'import', 'module': module, **bench_import(module, frames['import'])}
+            print(json.dumps(result), flush=True)
+            results.append(result)
+    for name, benchmark in benchmarks.items():
+        for subplots, lines, window, input_type in itertools.product(grid['subplots'], grid['lines'], grid['window'],
+                                                                     INPUT_TYPES):
+            case = {'input_type': input_type, 'subplots': subplots, 'lines': lines, 'window': window}
+            result = {'benchmark': name, **case, **benchmark(case, frames[name])}
+            print(json.dumps(result), flush=True)
+            results.append(result)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -8,7 +8,9 @@ setup(name='easyanimation',
       url='https://github.com/adriangb/easyanimation',
       package_dir={'easyanimation': 'src'},
       packages=['easyanimation'],
-      install_requires=['numpy>=1.16', 'matplotlib>=3.1', 'pyside2>5.12',
-                        'pyqtgraph@git+ssh://git@github.com/pyqtgraph/pyqtgraph@develop#egg=pyqtgraph'],
-      python_requires='>=3.7',
+      package_data={'easyanimation': ['web_client.html']},
+      install_requires=['numpy>=1.16', 'matplotlib>=3.1'],
+      extras_require={'qt': ['pyside2>5.12',
+                             'pyqtgraph@git+ssh://git@github.com/pyqtgraph/pyqtgraph@develop#egg=pyqtgraph']},
+      python_requires='>=3.8',
       )
@@ -1,46 +1,88 @@
-# Set backend
-import matplotlib
-
 # Imports
+# matplotlib is only imported once a figure is created (see mpl_helpers)
 import numpy as np
-from matplotlib import animation
-from matplotlib import pyplot as plt
 import itertools
 import time
+import warnings
 
+from .async_source import AsyncSource, is_async_source
+from .change_tracker import ChangeTracker
 from .data_slicer import data_slicer
+from .decimate import make_decimator
+from .figure_base import StreamingMixin, per_subplot
+from .layout import grid_positions, share_groups
+from .producer import ProducerThread
+from .recorder import Recorder
+from .ring_buffer import RingBuffer
+from .scheduler import SubplotScheduler
+from .stats import FrameStats
 
 
-class AnimatedFigure:
+class AnimatedFigure(StreamingMixin):
 
-    def __init__(self, data_function, plot_samples, interval=1, debug=False):
+    def __init__(self, data_function, plot_samples, interval=1, debug=False, decimate=None, threaded=False,
+                 queue_size=2, stats=None, backend=None, time_axis=False, rescale_interval=None, recorder=None,
+                 batched=False, layout=None, sharex=False, sharey=False):
         """
         Initializes the live-plots and starts polling for new data.
         If you want to edit the axis titles and such, instantiate the class then acess the self.axes object.
         :param data_function: a generator function which returns the plotting data whenever it is called.
-        Remeber, in Python functions are first class!
+        Remeber, in Python functions are first class! Async functions and async iterators are run by an AsyncSource.
         :param plot_samples: initial batch of data to be plotted. Refer to update_plots() for info on data format.
         :param interval: interval (in ms) between polling to data_function().
         Increase to reduce resource utilization at the cost of smoothness. Recommend setting to sampling freq of data.
-        :param debug: prints FPS at which plot is rendered.
+        Single value or one per subplot: the animation then ticks at the shortest interval and the other subplots are
+        only updated when their own interval has elapsed (see SubplotScheduler).
+        :param debug: prints FPS at which plot is rendered, and a warning if the plotting work makes frames slower than
+        interval.
+        :param decimate: min/max decimation of long windows, see MinMaxDecimator. Either the number of buckets
+        (roughly the number of pixels the data is drawn on), True to use the width of the axes in pixels, or None to plot
+        every sample. Single value or one per subplot.
+        :param threaded: call data_function in a background thread (see ProducerThread) instead of on the GUI thread.
+        Every frame then renders the newest completed data, frames the renderer could not keep up with are dropped.
+        :param queue_size: number of frames the background thread can get ahead of the renderer.
+        :param stats: a FrameStats collecting per-stage frame timings. None (default) disables all timing.
+        :param backend: matplotlib backend used while plotting. None (default) keeps the active backend, including
+        non-interactive ones such as Agg (benchmarks, tests), except IPython's inline backend, which is swapped for TkAgg
+        so that the figure can animate. matplotlib is only imported at this point.
+        :param time_axis: plot lines against their actual x values and scroll the x axis (see _update_x_limits())
+        instead of plotting against the sample index and relabelling the ticks. Handles non-uniform x spacing.
+        :param rescale_interval: time (in ms) between checks of the axis limits. Single value or one per subplot.
+        None (default) checks every plot_samples / 2 updates of the subplot.
+        :param recorder: a Recorder, or a directory to create one in, that every frame is recorded to. Enables
+        scrollback().
+        :param batched: draw all lines of a subplot as a single LineCollection, which is much cheaper to draw than one
+        Line2D per line when there are many lines. self.live_plot then holds one collection per subplot, and legends
+        need proxy artists.
+        :param layout: (rows, columns) of the subplot grid, filled row by row. None (default) puts every subplot in a
+        single row.
+        :param sharex: share the x axis between subplots, like matplotlib's sharex: False, True (all subplots), 'row' or
+        'col'. Only the outer subplots show tick labels, and a shared axis is scrolled and rescaled once per group, so
+        large grids cost less per frame. Subplots sharing an x axis should have the same plot_samples and x spacing.
+        :param sharey: same as sharex for the y axis. The limits then fit the data of the whole group.
         :return: animated plot object.
         """
-        # counter vars for performance monitoring
-        self.counter = 0
+        # performance monitoring
         self.debug = debug
+        if stats is None and debug:
+            stats = FrameStats(callback=self._print_stats)
+        self.stats = stats
         # initialize figure
-        self.interval = interval
+        if is_async_source(data_function):
+            data_function = AsyncSource(data_function)
         self.data_function = data_function
         init_data = self.data_function(0)
         self.num_plots = len(init_data)
-        try:
-            if len(plot_samples) > 1:
-                assert self.num_plots == len(plot_samples), \
-                    f"Size of plot_samples is {len(plot_samples)} while data_function signature is {self.num_plots}."
-                assert all([True if plot_sample > 1 else False for plot_sample in plot_samples]), "plot_samples must be >1"
-                self.plot_samples = plot_samples
-        except TypeError:
-            self.plot_samples = [plot_samples for _ in range(self.num_plots)]
+        if recorder is not None and not isinstance(recorder, Recorder):
+            recorder = Recorder(recorder, [len(plot_data) - 1 for plot_data in init_data])
+        self.recorder = recorder
+        self.paused = False  # see pause()
+        self._live_view = None  # limits and formatter of every axes when the figure was paused
+        self._pending_lines = []  # lines to blit with the next frame whether their subplot is updated or not
+        self.plot_samples = per_subplot(plot_samples, self.num_plots, 'plot_samples')
+        assert all(samples > 1 for samples in self.plot_samples), "plot_samples must be >1"
+        self.scheduler = SubplotScheduler(self.num_plots, interval, rescale_interval, self.plot_samples)
+        self.interval = self.scheduler.interval
         # make copies to avoid overwriting mutable objects
         initial_plot_data = []
         for xy_data, plot_samples in zip(init_data, self.plot_samples):
@@ -51,76 +93,162 @@ class AnimatedFigure:
             initial_plot_data.append(sublist)
         # Switch backends
         try:
-            self.original_backend = matplotlib.get_backend()
-            # Switch graphics backend to TkAgg to be able to function in IPython
-            matplotlib.use('TkAgg')
-        except:
-            print("Unable to load TkAgg.")
-            print("If using Spyder: Please to go to Tools > Preferences > IPython Console > Graphics and change Backend to \"Tkinter\"")
+            self.original_backend = _select_backend(backend)
+        except Exception:
+            if backend is not None:
+                warnings.warn(f"Unable to load the {backend} backend. If using Spyder: Please to go to Tools > "
+                              f"Preferences > IPython Console > Graphics and change Backend to \"Tkinter\"")
             raise
 
+        from matplotlib import pyplot as plt
+        from matplotlib.patches import Rectangle
+        from matplotlib.transforms import IdentityTransform
         self.fig = plt.figure()
-        self.axes = self.fig.subplots(1, self.num_plots, squeeze=False)[0]
+        (rows, columns), positions = grid_positions(self.num_plots, layout)
+        grid = self.fig.subplots(rows, columns, sharex=sharex, sharey=sharey, squeeze=False)
+        self.axes = grid.ravel()[:self.num_plots]
+        for row, column in itertools.product(range(rows), range(columns)):
+            if row * columns + column >= self.num_plots:
+                grid[row, column].remove()
+                if row > 0 and (row - 1) * columns + column < self.num_plots:
+                    # The last subplot of a column keeps its x tick labels, even if it is not on the bottom row
+                    grid[row - 1, column].xaxis.set_tick_params(which='both', labelbottom=True)
+        self._x_groups = share_groups(sharex, positions)  # subplots sharing each subplot's x axis
+        self._y_groups = share_groups(sharey, positions)
+        self._y_data = [None] * self.num_plots  # latest y data of each subplot, for shared y limits
         self.fig.canvas.mpl_connect('close_event', self.stop)
+        self.fig.canvas.mpl_connect('draw_event', self._cache_axes_bboxes)
+        self._axes_bboxes = {}  # extent of each axes including tick labels, as of the last draw
+        self._clear_patch = Rectangle((0, 0), 1, 1, transform=IdentityTransform(),
+                                      facecolor=self.fig.get_facecolor(), edgecolor='none')
         try:
             self.fig.canvas._master.report_callback_exception = self.exception_handler
         except AttributeError:
             print("Could not connect plot close callback")
+        self.batched = batched
+        self._segments = []  # (lines, points, 2) vertex array of every collection, updated in place
         self.live_plot = []
         for ax, y_data in zip(self.axes, initial_plot_data):
             sublist = []
-            for y in y_data:
-                new_line = ax.plot(y)[0]
-                sublist.append(new_line)
+            if batched:
+                from matplotlib.collections import LineCollection
+                segments = np.empty((len(y_data), len(y_data[0]), 2))
+                segments[:, :, 0] = np.arange(len(y_data[0]))
+                segments[:, :, 1] = y_data
+                # The paths of the collection are views of segments, see _set_lines()
+                sublist.append(ax.add_collection(LineCollection(segments, colors=[f'C{j % 10}'
+                                                                                  for j in range(len(y_data))])))
+                ax.autoscale_view()
+                self._segments.append(segments)
+            else:
+                for y in y_data:
+                    new_line = ax.plot(y)[0]
+                    sublist.append(new_line)
             self.live_plot.append(sublist)
         plt.tight_layout()
+        decimate = per_subplot(decimate, self.num_plots, 'decimate')
+        self.decimators = [make_decimator(plot_samples, int(ax.get_window_extent().width) if buckets is True else buckets)
+                           for ax, plot_samples, buckets in zip(self.axes, self.plot_samples, decimate)]
+        self.time_axis = time_axis
+        self._x_limits = [(np.nan, np.nan) for _ in range(self.num_plots)]  # current x limits in time_axis mode
         self.ani = None  # placeholder for animation object
-        self.timer = time.time()
+        self.threaded = threaded
+        self.queue_size = queue_size
+        self.producer = None  # background thread, started by animate() if threaded
+        self.change_tracker = ChangeTracker()  # subplots whose data did not change are skipped by update_plots()
+        # Function returning the time in ms subplots are scheduled on. None uses frame time, see update_plots()
+        self.clock = None
 
     def _update_x_labels(self, ax, x, plot_samples):
         """
         Rescale/relabel x axis.
-        Number and location of ticks is left to be auto determined, we just change the labels.
+        Number and location of ticks is left to be auto determined, we just change the labels: the ticks are sample
+        indices and an XLabelFormatter converts them to x values. Changing the labels only means changing its scale.
         :param ax: axis object to updated x axis labels on.
         :param x: iterable containing current x data. Must be of length plot_samples or greater.
         :param plot_samples: number of data points that the axis is displaying.
         :return: boolean indicating if redraw is necessary.
         """
+        from .mpl_helpers import XLabelFormatter, round_significant
         # If there are enough x-data points, update the x-axis labels
         if len(x) >= plot_samples:
-            x_ticks = ax.get_xticks()
-            x_tick_labels = [item.get_text() for item in ax.get_xticklabels() if len(item.get_text()) > 0]
-            new_labels = [float(f'{x:1.1}') for x in x_ticks / plot_samples * (x[-1] - x[-plot_samples])]
-            if new_labels[0] != float(x_tick_labels[0].replace(u'\u2212', '-'))\
-                    or new_labels[-1] != float(x_tick_labels[-1].replace(u'\u2212', '-')):
-                ax.set_xticklabels(new_labels)
-                return True
+            scale = (x[-1] - x[-plot_samples]) / plot_samples
+            if scale != scale:  # window still NaN padded
+                return False
+            formatter = ax.xaxis.get_major_formatter()
+            x_ticks = ax.get_xticks()[[0, -1]]
+            if not isinstance(formatter, XLabelFormatter):
+                formatter = XLabelFormatter()
+                ax.xaxis.set_major_formatter(formatter)
+            elif np.array_equal(round_significant(x_ticks * scale), round_significant(x_ticks * formatter.scale)):
+                return False
+            formatter.scale = scale
+            return True
         return False
 
+    def _update_x_limits(self, plot_num, ax, x):
+        """
+        Scrolls the x axis of a time_axis figure, where lines are plotted against their actual x values.
+        The limits are one window wide and only move when the newest sample runs past the right edge, then jump ahead
+        by a quarter window. All other frames just compare the newest x value against the cached limits.
+        :param plot_num: index of the subplot.
+        :param ax: axis object to scroll.
+        :param x: sliced x data.
+        :return: boolean indicating if redraw is necessary.
+        """
+        x_min, x_max = self._x_limits[plot_num]
+        newest = x[-1]
+        if x_min <= newest <= x_max or newest != newest:
+            return False
+        # The window span is only needed when scrolling, and then it is measured on the actual (non-uniform) x data
+        oldest = np.fmin.reduce(np.asarray(x, dtype=np.float64))
+        span = newest - oldest
+        if not span > 0:
+            return False
+        self._x_limits[plot_num] = (newest - 0.75 * span, newest + 0.25 * span)
+        ax.set_xlim(self._x_limits[plot_num])
+        return True
+
     def _update_y_labels(self, ax, y_points):
         """
         Rescale/relabel y axis. We don't use auto-scaling since that can cause hysteresis and unnecessary draws.
-        :param y_data: aggregate of all y data on plat (i.e. join all y data)
+        :param y_points: y data of every line in the subplot, see _calc_y_labels().
         :return: boolean indicating if redraw is necessary.
         """
         old_ymin, old_ymax = ax.get_ylim()
         new_min_lim, new_max_lim = self._calc_y_labels(y_points)
+        if new_min_lim != new_min_lim:  # no valid samples yet
+            return False
         if not ((.85 < old_ymax / new_max_lim < 1.15) and (.85 < old_ymin / new_min_lim < 1.15)):
             ax.set_ylim(bottom=new_min_lim, top=new_max_lim)
             return True
         return False
 
-    def _calc_y_labels(self, y_points):
+    @staticmethod
+    def _calc_y_labels(y_points):
+        """
+        Calculates new y axis limits from the y data of a subplot, ignoring None and NaN values.
+        :param y_points: y data of every line in the subplot (or the subplots sharing its y axis).
+        If every line is a RingBuffer with track_extrema=True its running extrema are used instead of the data.
+        :return: new_min_lim, new_max_lim
+        """
         # check if data is out of range of axis, if so force y-axis to update
-        y_valid = np.array([val for val in [y_point for y_list in y_points for y_point in y_list]
-                            if val is not None and not np.isnan(val)])
-        if len(y_valid) >= 2:
-            data_min, data_max = np.min(y_valid), np.max(y_valid)
-            data_range = data_max - data_min
-            new_max_lim = data_max + data_range * 0.1
-            new_min_lim = data_min - data_range * 0.1
+        if all(isinstance(y, RingBuffer) and y.tracks_extrema for y in y_points):
+            extrema = np.array([y.extrema() for y in y_points])
+            data_min, data_max = np.fmin.reduce(extrema[:, 0]), np.fmax.reduce(extrema[:, 1])
         else:
-            new_min_lim = new_max_lim = np.average(y_valid)
+            # fmin/fmax skip NaN (and None, which becomes NaN when cast to float) without a Python-level filter
+            try:
+                y_array = np.asarray(y_points, dtype=np.float64)
+                data_min, data_max = np.fmin.reduce(y_array, axis=None), np.fmax.reduce(y_array, axis=None)
+            except ValueError:
+                # Lines of different lengths, from subplots sharing their y axis
+                y_arrays = [np.asarray(y, dtype=np.float64) for y in y_points]
+                data_min = np.fmin.reduce([np.fmin.reduce(y) for y in y_arrays])
+                data_max = np.fmax.reduce([np.fmax.reduce(y) for y in y_arrays])
+        data_range = data_max - data_min
+        new_max_lim = data_max + data_range * 0.1
+        new_min_lim = data_min - data_range * 0.1
 
         if new_max_lim == new_min_lim:
             new_max_lim = new_max_lim + .1  # ensures if the line is constant axis are still scaled
@@ -133,65 +261,306 @@ class AnimatedFigure:
         Updates the live-plots based on new data collected.
         A maximum of plot_samples data points will be plotted.
         Axis limits are automatically adjusted.
-        :param idx: required parameter by FuncAnimation. It is not used.
-        :return: list of objects (axis) updated.
+        Subplots that are not due yet (see SubplotScheduler) or whose data did not change since the previous frame (see
+        ChangeTracker) are skipped entirely.
+        :param idx: frame index from FuncAnimation. Subplots with a longer interval are scheduled on self.clock, which
+        animate() sets to the wall clock. Without a clock (ex: export()) frames count as self.interval ms apart, so
+        offline renders are deterministic.
+        :return: list of the lines to blit: all lines of every changed subplot, and every line after a full draw of the
+        figure (which skips the animated lines).
         """
+        stats = self.stats
+        if stats:
+            stats.start_frame()
 
-        self.fps()
-
-        redraw = False
+        rescaled = set()  # subplots whose axes changed
+        scrolled, checked_x = set(), set()  # x axis groups already scrolled/checked in this frame
+        due_y = {}  # y axis groups to check in this frame: axes they are rescaled through
 
         try:
-            data = self.data_function(idx)  # data_function must return a tuple containing lists of x,y data
+            if self.producer is None:
+                data = self.data_function(idx)  # data_function must return a tuple containing lists of x,y data
+            else:
+                data = self.producer.latest()
         except StopIteration:
             self.stop(None)
             raise
+        if stats:
+            if self.producer is None:
+                stats.lap('data_function')
+            else:
+                # latest() only takes a frame out of the queue, the data_function call happened in the thread
+                stats.restart_lap()
+                if data is not None:
+                    stats.add('data_function', self.producer.data_time)
+                stats.dropped = self.producer.dropped
+        if data is None:
+            # The background thread has not finished a new frame yet, keep showing the current one. Lines hidden by a
+            # full draw in the meantime are blitted again right away
+            lines, self._pending_lines = self._pending_lines, []
+            return lines
+        if self.recorder is not None:
+            self.recorder.record(data)
+        if self.paused:
+            lines, self._pending_lines = self._pending_lines, []
+            return lines
 
-        for plot_num, (ax, plot_samples, (x, *y_points)) in enumerate(zip(self.axes, self.plot_samples, data)):
-            x, y_points = data_slicer(plot_samples, x, y_points)
-            # This way we can accept any iterable as y
-            for line, y in zip(self.live_plot[plot_num], y_points):
-                line.set_ydata(y)
-
-            if idx % (plot_samples / 2) == 0 and idx > 5:
-                # Only check every couple frames for speed
-                # Labels will not update properly on the first couple frames, skip them
-                if self._update_y_labels(ax, y_points) or self._update_x_labels(ax, x, plot_samples):
-                    redraw = True
-        if redraw:
-            self.fig.canvas.draw_idle()
-
-        return [line for plot in self.live_plot for line in plot]
-
-    def fps(self):
-        self.counter += 1
-        now = time.time()
-        elapsed = now - self.timer
-        if elapsed >= self.interval:
-            if self.debug:
-                print("FPS: %.2f" % (self.counter / elapsed))
-            if (self.counter / elapsed) < 1.25 * self.interval:
-                print("Warning: animation slowdown.")
-            self.counter = 0
-            self.timer = now
-        return
+        updated = []
+        now = idx * self.interval if self.clock is None else self.clock()
+        for plot_num, (ax, plot_samples, plot_data) in enumerate(zip(self.axes, self.plot_samples, data)):
+            if not self.scheduler.due(plot_num, now):
+                continue
+            if not self.change_tracker.changed(plot_num, plot_data):
+                # Unchanged subplots keep their lines and limits, and are not blitted
+                continue
+            x, *y_points = plot_data
+            x_sliced, y_sliced = data_slicer(plot_samples, x, y_points)
+            if stats:
+                stats.lap('data_slicer')
+            decimator = self.decimators[plot_num]
+            if decimator is None and not self.time_axis:
+                # This way we can accept any iterable as y
+                self._set_lines(plot_num, None, y_sliced)
+            else:
+                x_line, y_lines = x_sliced, y_sliced
+                if decimator is not None:
+                    count = y_points[0].count if isinstance(y_points[0], RingBuffer) else None
+                    positions, y_lines = decimator(y_sliced, count)
+                    # Without time_axis, lines are plotted against the sample index, which is what positions are
+                    x_line = np.asarray(x_sliced, dtype=np.float64)[positions] if self.time_axis else positions
+                self._set_lines(plot_num, x_line, y_lines)
+            if stats:
+                stats.lap('line_update')
+
+            # Buffers tracking their own extrema can be used directly if they hold no more than the visible window
+            if all(isinstance(y, RingBuffer) and y.tracks_extrema and y.capacity <= plot_samples for y in y_points):
+                self._y_data[plot_num] = y_points
+            else:
+                self._y_data[plot_num] = y_sliced
+            x_group, y_group = self._x_groups[plot_num], self._y_groups[plot_num]
+            # A shared axis is scrolled and rescaled once per frame, by the first subplot of its group updated in it
+            if self.time_axis and x_group not in scrolled:
+                scrolled.add(x_group)
+                if self._update_x_limits(x_group[0], ax, x_sliced):
+                    rescaled.update(x_group)
+            # Only check every couple frames for speed. A check that falls due while the subplot does not change waits
+            # for its next change, since the limits only depend on the data
+            if self.scheduler.rescale_due(plot_num, now):
+                # A y axis is checked after the loop, once every subplot sharing it has its data of this frame
+                due_y.setdefault(y_group, ax)
+                if not self.time_axis and x_group not in checked_x:
+                    checked_x.add(x_group)
+                    if self._update_x_labels(ax, x_sliced, plot_samples):
+                        rescaled.update(x_group)
+                if stats:
+                    stats.lap('rescale')
+            updated.append(plot_num)
+        for y_group, ax in due_y.items():
+            y_limits = [y for member in y_group if self._y_data[member] is not None for y in self._y_data[member]]
+            if self._update_y_labels(ax, y_limits):
+                rescaled.update(y_group)
+        if stats and due_y:
+            stats.lap('rescale')
+        if rescaled:
+            # Every subplot of a rescaled group is redrawn, then blitted with its lines
+            self._redraw_axes([self.axes[plot_num] for plot_num in sorted(rescaled)])
+            updated.extend(plot_num for plot_num in sorted(rescaled) if plot_num not in updated)
+            if stats:
+                stats.lap('draw')
+
+        lines = [line for plot_num in updated for line in self.live_plot[plot_num]]
+        if self._pending_lines:
+            lines.extend(line for line in self._pending_lines if line not in lines)
+            self._pending_lines = []
+        return lines
+
+    def _set_lines(self, plot_num, x, y_lines):
+        """
+        Sets the data of every line of a subplot.
+        :param plot_num: index of the subplot.
+        :param x: x data shared by all lines, or None to keep plotting against the sample index.
+        :param y_lines: y data of every line.
+        :return: None
+        """
+        if not self.batched:
+            for line, y in zip(self.live_plot[plot_num], y_lines):
+                if x is None:
+                    line.set_ydata(y)
+                else:
+                    line.set_data(x, y)
+            return
+        collection = self.live_plot[plot_num][0]
+        segments = self._segments[plot_num]
+        n = len(y_lines[0])
+        if segments.shape[1] != n:
+            # The number of points changed (decimation, scrollback), the paths are rebuilt around a new array
+            segments = self._segments[plot_num] = np.empty((len(y_lines), n, 2))
+            segments[:, :, 0] = np.arange(n)
+            collection.set_segments(segments)
+        # The paths share their vertices with segments, writing into it is all it takes to update the collection
+        if x is not None:
+            segments[:, :, 0] = x
+        segments[:, :, 1] = y_lines
+        collection.stale = True
+
+    def _cache_axes_bboxes(self, event):
+        for ax in self.axes:
+            self._axes_bboxes[ax] = ax.get_tightbbox(event.renderer)
+        # A full draw skips the animated lines, so every subplot has to be blitted again with the next frame, including
+        # those that are not due or did not change
+        self._pending_lines = [line for plot in self.live_plot for line in plot]
+
+    def _redraw_axes(self, axes):
+        """
+        Redraws only the given axes (tick labels, titles etc. included) and blits them, instead of the whole figure.
+        The lines are animated, so Axes.draw() skips them and the result doubles as the new blitting background,
+        which FuncAnimation picks up because the view limits changed.
+        :param axes: axes whose limits or tick labels changed.
+        :return: None
+        """
+        canvas = self.fig.canvas
+        if not getattr(canvas, 'supports_blit', False) or not hasattr(canvas, 'get_renderer'):
+            canvas.draw_idle()
+            return
+        from matplotlib.transforms import Bbox
+        renderer = canvas.get_renderer()
+        for ax in axes:
+            new_bbox = ax.get_tightbbox(renderer)
+            # The old tick labels may stick out further than the new ones, so clear the union of both
+            bbox = Bbox.union([self._axes_bboxes.get(ax, new_bbox), new_bbox]).padded(2)
+            self._axes_bboxes[ax] = new_bbox
+            self._clear_patch.set_bounds(bbox.x0, bbox.y0, bbox.width, bbox.height)
+            self._clear_patch.draw(renderer)
+            ax.draw(renderer)
+            canvas.blit(bbox)
+
+    def _print_stats(self, snapshot):
+        print("FPS: %.2f" % snapshot['fps'])
+        # Frames that are slower than the interval are only a slowdown if the plotting work is what makes them slow.
+        # Otherwise they are paced by the GUI timer and event loop (ex: at the default interval of 1 ms)
+        work = sum(stage['mean'] for stage in snapshot['stages'].values())
+        period = snapshot['frame_time']['mean']
+        if period > 1.25 * self.interval and work > 0.8 * period:
+            print("Warning: animation slowdown, frames take %.1f ms of work for an interval of %g ms." %
+                  (work, self.interval))
 
     def animate(self):
         """
         Starts showing the plotting window. Blocks execution of subsequent code (except calls to self.update_plots())!
         :return: None
         """
+        if self.threaded:
+            self.producer = ProducerThread(self.data_function, self.interval, self.queue_size)
+            self.producer.start()
+        from matplotlib import pyplot as plt
+        from .mpl_helpers import TimedAnimation
+        if self.clock is None:
+            # Frames come slower than interval whenever drawing takes longer, so live subplots are scheduled on the
+            # wall clock
+            start = time.perf_counter()
+            self.clock = lambda: (time.perf_counter() - start) * 1000
         # instantiate animation
-        self.ani = animation.FuncAnimation(fig=self.axes[0].figure, func=self.update_plots,
-                                           interval=self.interval, blit=True, frames=itertools.count(start=1))
+        self.ani = TimedAnimation(fig=self.axes[0].figure, func=self.update_plots, stats=self.stats,
+                                   interval=self.interval, blit=True, frames=itertools.count(start=1))
         plt.show(block=True)
         return
 
+    def export(self, path, frames, fps=30):
+        """
+        Renders frames offline as fast as possible instead of showing them in real time. Use instead of animate().
+        For splitting the rendering over several processes, see export.export().
+        :param path: output video file (needs ffmpeg), or a PNG sequence pattern such as frames/frame_%05d.png.
+        :param frames: range of frame indices to render.
+        :param fps: frame rate of the video.
+        :return: number of frames written.
+        """
+        from .export import render_frames, write_frames
+        return write_frames(render_frames(self, frames), path, fps, first_frame=frames[0])
+
+    def pause(self):
+        """
+        Freezes the plots. Frames keep being polled (and recorded), resume() goes back to the live data.
+        :return: None
+        """
+        if self.paused:
+            return
+        self.paused = True
+        self._live_view = []
+        for plot_num, (ax, lines) in enumerate(zip(self.axes, self.live_plot)):
+            # scrollback() may write into the segments array of a collection, so it is copied
+            line_data = self._segments[plot_num].copy() if self.batched else [line.get_data() for line in lines]
+            self._live_view.append((ax.get_xlim(), ax.get_ylim(), ax.xaxis.get_major_formatter(), line_data))
+
+    def resume(self):
+        """
+        Leaves pause() or scrollback(), the plots show the live data again from the next frame.
+        :return: None
+        """
+        if not self.paused:
+            return
+        self.paused = False
+        for plot_num, (ax, lines, live_view) in enumerate(zip(self.axes, self.live_plot, self._live_view)):
+            x_limits, y_limits, formatter, line_data = live_view
+            ax.set_xlim(x_limits)
+            ax.set_ylim(y_limits)
+            ax.xaxis.set_major_formatter(formatter)
+            # Some lines only get set_ydata() every frame, put back the x data (sample indices) scrollback() replaced
+            if self.batched:
+                self._segments[plot_num] = line_data
+                lines[0].set_segments(line_data)
+            else:
+                for line, (x, y) in zip(lines, line_data):
+                    line.set_data(x, y)
+        # Subplots that are not due in the next frame still have to show the restored lines
+        self._pending_lines = [line for plot in self.live_plot for line in plot]
+        self.change_tracker.reset()
+        self._redraw_axes(self.axes)
+
+    def scrollback(self, x_start, x_end, n_buckets=None):
+        """
+        Pauses the figure and shows the recorded samples with x_start <= x <= x_end in every subplot, min/max
+        decimated when the range is long. Recording carries on meanwhile, call resume() to go back to live.
+        :param x_start: first x value to show.
+        :param x_end: last x value to show.
+        :param n_buckets: number of decimation buckets, see Recorder.read(). Defaults to the width of each axes in
+        pixels.
+        :return: None
+        """
+        assert self.recorder is not None, "scrollback() requires a recorder."
+        from matplotlib.ticker import ScalarFormatter
+        self.pause()
+        recorded = []
+        for plot_num, ax in enumerate(self.axes):
+            buckets = int(ax.get_window_extent().width) if n_buckets is None else n_buckets
+            x, y_points = self.recorder.read(plot_num, x_start, x_end, buckets)
+            self._set_lines(plot_num, x, y_points)
+            # The recorded lines are plotted against their x values, not the sample index
+            ax.xaxis.set_major_formatter(ScalarFormatter())
+            ax.set_xlim(x_start, x_end)
+            recorded.append(y_points if len(x) else [])
+        for y_group in set(self._y_groups):
+            y_limits = [y for member in y_group for y in recorded[member]]
+            if y_limits:
+                new_min_lim, new_max_lim = self._calc_y_labels(y_limits)
+                if new_min_lim == new_min_lim:
+                    self.axes[y_group[0]].set_ylim(new_min_lim, new_max_lim)
+        self._redraw_axes(self.axes)
+        self._pending_lines = [line for plot in self.live_plot for line in plot]
+
     def stop(self, _):
+        if self.producer:
+            self.producer.stop()
+        if self.recorder is not None:
+            self.recorder.flush()
+        if isinstance(self.data_function, AsyncSource):
+            self.data_function.close()
         if self.ani:
             if self.ani.event_source:
                 self.ani.event_source.stop()
-        matplotlib.use(self.original_backend)
+        import matplotlib
+        from matplotlib import pyplot as plt
+        if self.original_backend is not None:
+            matplotlib.use(self.original_backend)
         plt.close(self.fig)
 
     def exception_handler(self, exc, val, tb):
@@ -204,3 +573,22 @@ class AnimatedFigure:
             pass
         else:
             raise val
+
+
+def _select_backend(backend):
+    """
+    Switches matplotlib to the backend a new figure should use.
+    :param backend: backend requested by the user, or None to keep the active one unless it is IPython's inline
+    backend, which cannot animate and is replaced by TkAgg.
+    :return: the previously active backend if it was switched (restored by stop()), otherwise None.
+    """
+    import matplotlib
+    current = matplotlib.get_backend()
+    if backend is None:
+        if 'inline' not in current.lower():
+            return None
+        backend = 'TkAgg'
+    if backend.lower() == current.lower():
+        return None
+    matplotlib.use(backend)
+    return current
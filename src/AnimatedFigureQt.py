@@ -1,58 +1,125 @@
+import time
+
 from pyqtgraph.Qt import QtGui, QtCore
 import pyqtgraph as pg
 import numpy as np
 
-from src.data_slicer import data_slicer
+from .async_source import AsyncSource, is_async_source
+from .change_tracker import ChangeTracker
+from .data_slicer import data_slicer
+from .decimate import make_decimator
+from .figure_base import StreamingMixin, per_subplot
+from .layout import grid_positions, share_groups
+from .producer import LatestFrame
+from .recorder import Recorder
+from .ring_buffer import RingBuffer
+from .scheduler import SubplotScheduler
 
 class Thread(QtCore.QThread):
-    dataChanged = QtCore.Signal(np.ndarray)
+    """
+    Polls data_function and hands the frames to plot_fun on the GUI thread, through a LatestFrame: only the newest frame
+    is kept, as a copy, and the GUI is signalled once per frame it has not picked up yet.
+    """
+    frameReady = QtCore.Signal()
 
-    def __init__(self, close_fun, data_function, plot_fun, interval, *args, **kwargs):
+    def __init__(self, close_fun, data_function, plot_fun, interval, adaptive=False, *args, **kwargs):
         super(Thread, self).__init__(*args, **kwargs)
         self.idx = 1
         self.data_function = data_function
-        self.dataChanged.connect(plot_fun)
-        self.interval = interval
+        self.plot_fun = plot_fun
+        self.frameReady.connect(self.deliver)
+        self.frames = LatestFrame(interval, adaptive)
         self.stop_parent = close_fun
+        self.data_time = 0  # time spent in the last data_function call, in s
+
+    @property
+    def dropped(self):
+        return self.frames.dropped
 
     def run(self):
         self.threadactive = True
         while self.threadactive:
             try:
+                start = time.perf_counter()
                 data = self.data_function(self.idx)
-                self.dataChanged.emit(data)
+                self.data_time = time.perf_counter() - start
+                if self.frames.put(data):
+                    # The GUI picks up whatever is newest when it gets to it, one signal is enough
+                    self.frameReady.emit()
                 self.idx += 1
-                QtCore.QThread.msleep(self.interval)
+                QtCore.QThread.msleep(self.frames.sleep_time())
             except StopIteration:
                 self.stop()
                 break
 
+    @QtCore.Slot()
+    def deliver(self):
+        data = self.frames.take()
+        if data is None:
+            return
+        start = time.perf_counter()
+        self.plot_fun(data)
+        self.frames.rendered(time.perf_counter() - start)
+
     def stop(self):
         self.threadactive = False
         self.stop_parent(None)
         self.wait()
 
 
-class AnimatedFigure(object):
-    def __init__(self, data_function, plot_samples, interval=1):
+class AnimatedFigure(StreamingMixin):
+    def __init__(self, data_function, plot_samples, interval=1, decimate=None, adaptive=False, stats=None,
+                 rescale_interval=None, recorder=None, batched=False, layout=None, sharex=False, sharey=False):
+        """
+        :param interval: interval (in ms) between polling to data_function. Single value or one per subplot: the
+        data_function is polled at the shortest interval and the other subplots are only updated when their own
+        interval has elapsed (see SubplotScheduler).
+        :param adaptive: slow down polling of data_function to the measured render rate, see LatestFrame.sleep_time().
+        :param stats: a FrameStats collecting per-stage frame timings. pyqtgraph repaints asynchronously, so there is no
+        'draw' stage and 'line_update' covers the setData() calls. None (default) disables all timing.
+        :param decimate: min/max decimation of long windows, see MinMaxDecimator. Either the number of buckets,
+        True to use the width of the plot in pixels, or None to plot every sample. Single value or one per subplot.
+        :param rescale_interval: time (in ms) between fits of the axis ranges to the data. Single value or one per
+        subplot. None (default) leaves pyqtgraph's auto range on, which refits on every update.
+        :param recorder: a Recorder, or a directory to create one in, that every frame is recorded to. Enables
+        scrollback().
+        :param batched: draw all lines of a subplot as a single curve (the lines laid end to end, with breaks in
+        between), which costs one path per subplot instead of one per line. All lines of a subplot then share the pen
+        of the first one and self.curves holds one curve per subplot.
+        :param layout: (rows, columns) of the plot grid, filled row by row. None (default) puts every plot in a single
+        row.
+        :param sharex: link the x axis of plots, like matplotlib's sharex: False, True (all plots), 'row' or 'col'. Only
+        the outer plots show tick values. With rescale_interval, a shared axis is fitted once per group to the data of
+        all its plots, otherwise linked plots follow the auto range of the first plot of their group.
+        :param sharey: same as sharex for the y axis.
+        """
         # sys.stderr = object       # Can be used to disable unimportant errors / warnings
         self.app = QtGui.QApplication.instance()
         if self.app is None:
             self.app = QtGui.QApplication([])
         # get data updating function & initialize plot params
-        self.interval = interval
+        self.adaptive = adaptive
+        self.stats = stats
+        if is_async_source(data_function):
+            data_function = AsyncSource(data_function)
         self.data_function = data_function
         init_data = self.data_function(0)
         self.num_plots = len(init_data)
-        try:
-            if len(plot_samples) > 1:
-                assert self.num_plots == len(plot_samples), \
-                    f"Size of plot_samples is {len(plot_samples)} while data_function signature is {self.num_plots}."
-                assert all(
-                    [True if plot_sample > 1 else False for plot_sample in plot_samples]), "plot_samples must be >1"
-                self.plot_samples = plot_samples
-        except TypeError:
-            self.plot_samples = [plot_samples for _ in range(self.num_plots)]
+        if recorder is not None and not isinstance(recorder, Recorder):
+            recorder = Recorder(recorder, [len(plot_data) - 1 for plot_data in init_data])
+        self.recorder = recorder
+        self.paused = False  # see pause()
+        self.plot_samples = per_subplot(plot_samples, self.num_plots, 'plot_samples')
+        assert all(samples > 1 for samples in self.plot_samples), "plot_samples must be >1"
+        self.scheduler = SubplotScheduler(self.num_plots, interval, rescale_interval, self.plot_samples)
+        self.interval = self.scheduler.interval
+        self.rescale_interval = rescale_interval
+        self.decimate = per_subplot(decimate, self.num_plots, 'decimate')
+        self.decimators = [None] * self.num_plots  # created in animate() once the plot widths are known
+        self.batched = batched
+        self._batches = [None] * self.num_plots  # (2, lines, points + 1) x/y arrays of the batched curves
+        self.thread = None  # started by animate()
+        self.change_tracker = ChangeTracker()  # subplots whose data did not change are skipped by update()
 
         # initialize plots
         self.win = pg.GraphicsLayoutWidget(show=True)
@@ -61,30 +128,162 @@ class AnimatedFigure(object):
         self.curves = [[None for _ in y[1:]] for y in init_data]
 
         # Workaround to be able to add labels before calling the animate() method
-        for i in range(self.num_plots):
-            self.axes[i] = self.win.addPlot()
+        _, positions = grid_positions(self.num_plots, layout)
+        for i, (row, column) in enumerate(positions):
+            self.axes[i] = self.win.addPlot(row=row, col=column)
+        self._x_groups = share_groups(sharex, positions)  # plots sharing each plot's x axis
+        self._y_groups = share_groups(sharey, positions)
+        for i, (row, column) in enumerate(positions):
+            x_group, y_group = self._x_groups[i], self._y_groups[i]
+            if x_group[0] != i:
+                self.axes[i].setXLink(self.axes[x_group[0]])
+            if y_group[0] != i:
+                self.axes[i].setYLink(self.axes[y_group[0]])
+            # Like matplotlib's label_outer(), values are only shown on the outer plots of a shared axis
+            if any(positions[j][1] == column and positions[j][0] > row for j in x_group):
+                self.axes[i].getAxis('bottom').setStyle(showValues=False)
+            if any(positions[j][0] == row and positions[j][1] < column for j in y_group):
+                self.axes[i].getAxis('left').setStyle(showValues=False)
 
-    @QtCore.Slot(np.ndarray)
     def update(self, data):
+        stats = self.stats
+        if stats:
+            stats.start_frame()
+            if self.thread is not None:
+                stats.add('data_function', self.thread.data_time)
+                stats.dropped = self.thread.dropped
+        if self.recorder is not None:
+            self.recorder.record(data)
+        if self.paused:
+            return
+        now = time.perf_counter() * 1000  # the polling thread is free running, schedule on the wall clock
+        due = []  # plots whose ranges are fitted in this frame
         for i, (plot_data, plot_samples) in enumerate(zip(data, self.plot_samples)):
-            x, y_points = data_slicer(plot_samples, plot_data[0], plot_data[1:])
-            for j, y in enumerate(y_points):
-                self.curves[i][j].setData(x=x, y=y)
+            if not self.scheduler.due(i, now):
+                continue
+            if not self.change_tracker.changed(i, plot_data):
+                # setData would rebuild the curve path for nothing
+                continue
+            x, y_sliced = data_slicer(plot_samples, plot_data[0], plot_data[1:])
+            if stats:
+                stats.lap('data_slicer')
+            if self.decimators[i] is not None:
+                y_points = plot_data[1:]
+                count = y_points[0].count if isinstance(y_points[0], RingBuffer) else None
+                positions, y_sliced = self.decimators[i](y_sliced, count)
+                x = np.asarray(x, dtype=np.float64)[positions]
+            self._set_curves(i, x, y_sliced)
+            if stats:
+                stats.lap('line_update')
+            if self.rescale_interval is not None and self.scheduler.rescale_due(i, now):
+                due.append(i)
+        # Fitted once every plot has its data of this frame, so shared axes cover all of it
+        checked_x, checked_y = set(), set()  # shared axes already fitted in this frame
+        for i in due:
+            self._fit_ranges(i, checked_x, checked_y)
+        if stats and due:
+            stats.lap('rescale')
+
+    def _fit_ranges(self, plot_num, checked_x, checked_y):
+        """
+        Fits the axis ranges of a plot to its data. Shared axes are fitted once per frame, through the first plot of
+        their group, to the data of every plot in the group.
+        """
+        x_group, y_group = self._x_groups[plot_num], self._y_groups[plot_num]
+        if len(x_group) == len(y_group) == 1:
+            self.axes[plot_num].autoRange()
+            return
+        for axis, group, checked in ((0, x_group, checked_x), (1, y_group, checked_y)):
+            if group in checked:
+                continue
+            checked.add(group)
+            bounds = [self.axes[j].vb.childrenBounds()[axis] for j in group]
+            bounds = [b for b in bounds if b is not None]
+            if bounds:
+                set_range = self.axes[group[0]].setXRange if axis == 0 else self.axes[group[0]].setYRange
+                set_range(min(b[0] for b in bounds), max(b[1] for b in bounds))
+
+    def _set_curves(self, plot_num, x, y_lines):
+        if not self.batched:
+            for curve, y in zip(self.curves[plot_num], y_lines):
+                curve.setData(x=x, y=y)
+            return
+        n = len(x)
+        batch = self._batches[plot_num]
+        if batch is None or batch.shape[2] != n + 1:
+            # The trailing NaN of every line is the break connect='finite' draws between lines
+            batch = self._batches[plot_num] = np.full((2, len(y_lines), n + 1), np.nan)
+        batch[0, :, :n] = x
+        batch[1, :, :n] = y_lines
+        self.curves[plot_num][0].setData(x=batch[0].ravel(), y=batch[1].ravel(), connect='finite')
 
     def animate(self):
-        # Workaround to be able to add labels before calling the animate() method
-        for i, plot in enumerate(self.curves):
-            if len(plot) > 1:
-                self.axes[i].addLegend()
-            for j, curve in enumerate(plot):
-                if self.curves[i][j] is None:
-                    self.curves[i][j] = f"Curve {j}"
-                self.curves[i][j] = self.axes[i].plot(pen=pg.mkPen(color=j, width=3), name=self.curves[i][j])
-        self.thread = Thread(self.stop, self.data_function, self.update, self.interval)
+        self.create_curves()
+        self.thread = Thread(self.stop, self.data_function, self.update, self.interval, self.adaptive)
         self.thread.start()
         self.app.exec_()
 
+    def create_curves(self):
+        """
+        Creates the curves (and sizes the decimators). Called by animate(), so that labels can be set before.
+        """
+        # Workaround to be able to add labels before calling the animate() method
+        for i, plot in enumerate(self.curves):
+            if self.batched:
+                self.curves[i] = [self.axes[i].plot(pen=pg.mkPen(color=0, width=3))]
+            else:
+                if len(plot) > 1:
+                    self.axes[i].addLegend()
+                for j, curve in enumerate(plot):
+                    if self.curves[i][j] is None:
+                        self.curves[i][j] = f"Curve {j}"
+                    self.curves[i][j] = self.axes[i].plot(pen=pg.mkPen(color=j, width=3), name=self.curves[i][j])
+            if self.rescale_interval is not None:
+                # Ranges are fitted by update() at the rescale interval instead
+                self.axes[i].disableAutoRange()
+        self.app.processEvents()  # lay out the window so the plot widths are known
+        for i, (plot_samples, buckets) in enumerate(zip(self.plot_samples, self.decimate)):
+            if buckets is True:
+                buckets = int(self.axes[i].vb.width())
+            self.decimators[i] = make_decimator(plot_samples, buckets)
+
+    def pause(self):
+        """
+        Freezes the plots. Frames keep being polled (and recorded), resume() goes back to the live data.
+        """
+        self.paused = True
+
+    def resume(self):
+        """
+        Leaves pause() or scrollback(), the plots show the live data again from the next frame.
+        """
+        self.paused = False
+        self.change_tracker.reset()
+        if self.rescale_interval is None:
+            for ax in self.axes:
+                ax.enableAutoRange()
+
+    def scrollback(self, x_start, x_end, n_buckets=None):
+        """
+        Pauses the figure and shows the recorded samples with x_start <= x <= x_end in every subplot, min/max
+        decimated when the range is long. Recording carries on meanwhile, call resume() to go back to live.
+        :param n_buckets: number of decimation buckets, see Recorder.read(). Defaults to the width of each plot in
+        pixels.
+        """
+        assert self.recorder is not None, "scrollback() requires a recorder."
+        self.pause()
+        for plot_num, ax in enumerate(self.axes):
+            buckets = int(ax.vb.width()) if n_buckets is None else n_buckets
+            x, y_points = self.recorder.read(plot_num, x_start, x_end, buckets)
+            self._set_curves(plot_num, x, y_points)
+            ax.autoRange()
+            ax.setXRange(x_start, x_end, padding=0)
+
     def stop(self, _):
+        if self.recorder is not None:
+            self.recorder.flush()
+        if isinstance(self.data_function, AsyncSource):
+            self.data_function.close()
         self.app.closeAllWindows()
 
 
@@ -0,0 +1,403 @@
+import asyncio
+import base64
+import contextlib
+import hashlib
+import json
+import os
+import struct
+import threading
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from .async_source import AsyncSource, is_async_source
+from .change_tracker import ChangeTracker
+from .data_slicer import data_slicer
+from .decimate import make_decimator
+from .figure_base import StreamingMixin, per_subplot
+from .layout import grid_positions
+from .producer import snapshot
+from .recorder import Recorder
+from .ring_buffer import RingBuffer
+from .scheduler import SubplotScheduler
+from .shared_source import SharedStreamSource
+from .stream_source import StreamSource
+
+REPLACE, APPEND = 0, 1  # message kinds, see encode_message()
+_HEADER = struct.Struct('<BxHI')  # kind, plot_num, number of samples
+_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'  # RFC 6455 handshake constant
+
+
+class AnimatedFigure(StreamingMixin):
+    """
+    Serves live plots to web browsers over a WebSocket, with the same data_function contract as the matplotlib and Qt
+    figures. Open http://host:port/ to get the viewer, a single page drawing on canvases.
+    Frames are sliced (and decimated) on the server like in the other backends, but instead of pixels only the samples
+    that are new since the previous frame are sent, as compact binary messages (see encode_message()) that every viewer
+    appends to its own copy of the window. Decimated subplots send their whole decimated window, which is bounded by
+    the number of buckets. Every connected viewer gets the same messages, so the cost of a frame does not depend on the
+    number of viewers. Viewers that cannot keep up skip frames and are resynchronised once they caught up.
+    Viewers never take back samples they were sent, so every frame is sliced from a copy taken right after
+    data_function returned it (see _read()).
+    Only the Python standard library is used for the server.
+    """
+    max_buffer = 2 ** 20  # bytes queued for a viewer before it skips frames
+
+    def __init__(self, data_function, plot_samples, interval=1, decimate=None, stats=None, recorder=None,
+                 layout=None, host='127.0.0.1', port=8765, lock=None, origins=None):
+        """
+        :param data_function: same as for the other figures. Async functions and async iterators are run by an
+        AsyncSource. x values must be increasing for new samples to be told apart from the ones already sent.
+        :param plot_samples: number of samples shown in each subplot. Single value or one per subplot.
+        :param interval: interval (in ms) between polling to data_function. Single value or one per subplot, see
+        SubplotScheduler.
+        :param decimate: min/max decimation of long windows to this many buckets, see MinMaxDecimator. Single value or
+        one per subplot. None plots every sample.
+        :param stats: a FrameStats collecting per-stage frame timings. 'line_update' covers encoding the messages and
+        'draw' handing them to the viewers. None (default) disables all timing.
+        :param recorder: a Recorder, or a directory to create one in, that every frame is recorded to.
+        :param layout: (rows, columns) of the subplot grid in the viewer. None (default) puts every subplot in a row.
+        :param host: address to listen on. The default only accepts viewers from this machine.
+        :param port: port to listen on. 0 picks a free port, see self.port once start()ed.
+        :param lock: lock (ex: threading.Lock) that the code filling data_function's buffers from another thread holds
+        while writing to them. data_function is called and its frame copied under it, so that no frame has x and y
+        from different writes. Not needed with StreamSource and SharedStreamSource, which return consistent copies.
+        :param origins: origins of other pages allowed to open the WebSocket, ex: ['http://example.com:8080']. The
+        viewer's own page is always allowed when served from host, localhost, 127.0.0.1 or [::1]. Clients that send no
+        Origin header (not browsers) are allowed too.
+        """
+        self.stats = stats
+        if is_async_source(data_function):
+            data_function = AsyncSource(data_function)
+        self.data_function = data_function
+        init_data = self.data_function(0)
+        self.num_plots = len(init_data)
+        self.lines_per_plot = [len(plot_data) - 1 for plot_data in init_data]
+        if recorder is not None and not isinstance(recorder, Recorder):
+            recorder = Recorder(recorder, self.lines_per_plot)
+        self.recorder = recorder
+        self.plot_samples = per_subplot(plot_samples, self.num_plots, 'plot_samples')
+        assert all(samples > 1 for samples in self.plot_samples), "plot_samples must be >1"
+        self.scheduler = SubplotScheduler(self.num_plots, interval, None, self.plot_samples)
+        self.interval = self.scheduler.interval
+        decimate = per_subplot(decimate, self.num_plots, 'decimate')
+        self.decimators = [make_decimator(plot_samples, buckets)
+                           for plot_samples, buckets in zip(self.plot_samples, decimate)]
+        self.layout, _ = grid_positions(self.num_plots, layout)
+        self.host = host
+        self.port = port
+        self.lock = lock
+        self.origins = {origin.lower().rstrip('/') for origin in origins or ()}
+        self.change_tracker = ChangeTracker()  # subplots whose data did not change are skipped by update()
+        self._data = None  # latest frame, viewers joining or catching up are sent its whole window
+        self._frame = None  # latest copy taken by _read()
+        self._copy_changes = ChangeTracker()  # subplots _read() does not need to copy again
+        self._last_x = [None] * self.num_plots  # newest x value sent for every subplot
+        self._viewers = {}  # StreamWriter: True if it needs the whole window before the next deltas
+        self._loop = None
+        self._stopped = None  # asyncio.Event ending serve()
+        self._ready = threading.Event()
+        self._thread = None
+
+    def update(self, idx, data):
+        """
+        Sends the new samples of a frame to every viewer.
+        :param idx: frame index, frames are self.interval ms apart.
+        :param data: frame as returned by _read(). It must not change afterwards, since viewers that join later are sent
+        its whole window.
+        :return: the WebSocket message sent to the viewers, None if nothing changed.
+        """
+        stats = self.stats
+        if self.recorder is not None:
+            self.recorder.record(data)
+        self._data = data
+        now = idx * self.interval
+        messages = []
+        for plot_num, plot_data in enumerate(data):
+            if not self.scheduler.due(plot_num, now):
+                continue
+            if not self.change_tracker.changed(plot_num, plot_data):
+                continue
+            kind, x, y_lines = self._window(plot_num, plot_data, delta=True)
+            if stats:
+                stats.lap('data_slicer')
+            if len(x):
+                messages.append(encode_message(kind, plot_num, x, y_lines))
+            if stats:
+                stats.lap('line_update')
+        if not messages:
+            return None
+        frame = _ws_frame(0x2, b''.join(messages))
+        self._broadcast(frame)
+        if stats:
+            stats.lap('draw')
+        return frame
+
+    def _window(self, plot_num, plot_data, delta):
+        """
+        Slices (and decimates) a subplot.
+        :param delta: only return the samples newer than the ones sent by the previous delta, if possible. Viewers drop
+        samples they already have, so a whole window can be sent in between.
+        :return: kind (REPLACE or APPEND), x, y_lines
+        """
+        x, *y_points = plot_data
+        x_sliced, y_sliced = data_slicer(self.plot_samples[plot_num], x, y_points)
+        decimator = self.decimators[plot_num]
+        x_sliced = np.asarray(x_sliced, dtype=np.float64)
+        newest, last = x_sliced[-1], self._last_x[plot_num]
+        if delta and newest == newest:  # not NaN padding only
+            self._last_x[plot_num] = newest
+        if decimator is not None:
+            count = y_points[0].count if isinstance(y_points[0], RingBuffer) else None
+            positions, y_lines = decimator(y_sliced, count)
+            return REPLACE, x_sliced[positions], y_lines
+        if delta and last is not None and newest > last:
+            first = int(np.argmax(x_sliced > last))
+            return APPEND, x_sliced[first:], [y[first:] for y in y_sliced]
+        # First frame, x went backwards, or the data changed without new x values
+        return REPLACE, x_sliced, y_sliced
+
+    def _snapshot(self):
+        """
+        :return: message with the whole window of every subplot in the latest frame.
+        """
+        return _ws_frame(0x2, b''.join(encode_message(REPLACE, plot_num, *self._window(plot_num, plot_data,
+                                                                                           delta=False)[1:])
+                                       for plot_num, plot_data in enumerate(self._data)))
+
+    def _broadcast(self, frame):
+        snapshot = None
+        for writer, stale in list(self._viewers.items()):
+            if writer.transport.get_write_buffer_size() > self.max_buffer:
+                # The viewer misses these samples, it is sent the whole window again once it drained
+                self._viewers[writer] = True
+                continue
+            if stale:
+                if snapshot is None:
+                    snapshot = self._snapshot()
+                writer.write(snapshot)
+                self._viewers[writer] = False
+            elif frame is not None:
+                writer.write(frame)
+
+    def _read(self, idx):
+        """
+        Calls data_function and copies its frame (see snapshot()), under self.lock if there is one. StreamSource and
+        SharedStreamSource frames are already copies taken under their own lock and are returned as they are.
+        """
+        with self.lock or contextlib.nullcontext():
+            data = self.data_function(idx)
+            if data is None or isinstance(self.data_function, (StreamSource, SharedStreamSource)):
+                return data
+            self._frame = snapshot(data, self._frame, self._copy_changes)
+        return self._frame
+
+    async def _poll(self):
+        loop = asyncio.get_running_loop()
+        idx = 1
+        deadline = loop.time()
+        while True:
+            if self.stats:
+                self.stats.start_frame()
+            try:
+                # In an executor so that a slow data_function does not hold up the viewers' connections
+                data = await loop.run_in_executor(None, self._read, idx)
+            except StopIteration:
+                self._stopped.set()
+                return
+            if self.stats:
+                self.stats.lap('data_function')
+            if data is not None:
+                self.update(idx, data)
+                if any(self._viewers.values()):
+                    # Viewers that joined or caught up get the whole window even if nothing changed
+                    self._broadcast(None)
+            idx += 1
+            deadline += self.interval / 1000
+            await asyncio.sleep(max(0., deadline - loop.time()))
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await reader.readuntil(b'\r\n\r\n')
+            request_line, *header_lines = request.decode('latin-1').split('\r\n')
+            headers = {}
+            for line in header_lines:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            if headers.get('upgrade', '').lower() != 'websocket':
+                self._serve_page(request_line, writer)
+                return
+            if not self._allowed_origin(headers.get('origin')):
+                # Any page the browser has open could connect otherwise
+                writer.write(b'HTTP/1.1 403 Forbidden\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                return
+            accept = base64.b64encode(hashlib.sha1((headers['sec-websocket-key'] + _GUID).encode()).digest())
+            writer.write(b'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                         b'Sec-WebSocket-Accept: ' + accept + b'\r\n\r\n')
+            writer.write(_ws_frame(0x1, json.dumps({'lines_per_plot': self.lines_per_plot,
+                                                    'plot_samples': list(self.plot_samples),
+                                                    'layout': list(self.layout)}).encode()))
+            self._viewers[writer] = True  # sent the whole window on the next frame
+            while True:
+                opcode, payload = await _read_ws_frame(reader)
+                if opcode == 0x8:  # close
+                    writer.write(_ws_frame(0x8, payload[:2]))
+                    break
+                if opcode == 0x9:  # ping
+                    writer.write(_ws_frame(0xA, payload))
+        except asyncio.LimitOverrunError:  # headers longer than the reader's buffer limit (64 KiB)
+            writer.write(b'HTTP/1.1 431 Request Header Fields Too Large\r\nContent-Length: 0\r\n'
+                         b'Connection: close\r\n\r\n')
+        except _ProtocolError:
+            writer.write(_ws_frame(0x8, struct.pack('!H', 1002)))
+        except (asyncio.IncompleteReadError, ConnectionError, KeyError, ValueError):
+            pass
+        finally:
+            self._viewers.pop(writer, None)
+            writer.close()
+
+    def _allowed_origin(self, origin):
+        if origin is None:
+            return True
+        origin = origin.lower().rstrip('/')
+        if origin in self.origins:
+            return True
+        try:
+            parts = urlsplit(origin)
+            port = parts.port
+        except ValueError:
+            return False
+        host = f'[{parts.hostname}]' if parts.hostname and ':' in parts.hostname else parts.hostname
+        return (parts.scheme == 'http' and port == self.port and
+                host in {self.host.lower(), 'localhost', '127.0.0.1', '[::1]'})
+
+    @staticmethod
+    def _serve_page(request_line, writer):
+        method, path, *_ = request_line.split(' ') + ['', '']
+        if method == 'GET' and path in ('/', '/index.html'):
+            with open(os.path.join(os.path.dirname(__file__), 'web_client.html'), 'rb') as f:
+                body, status = f.read(), b'200 OK'
+        else:
+            body, status = b'Not found', b'404 Not Found'
+        writer.write(b'HTTP/1.1 ' + status + b'\r\nContent-Type: text/html; charset=utf-8\r\nContent-Length: ' +
+                     str(len(body)).encode() + b'\r\nConnection: close\r\n\r\n' + body)
+
+    async def serve(self):
+        """
+        Serves the plots on the running event loop until stop() is called or data_function raises StopIteration.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        poll = asyncio.ensure_future(self._poll())
+        try:
+            await self._stopped.wait()
+        finally:
+            poll.cancel()
+            server.close()
+            for writer in list(self._viewers):
+                writer.close()
+            await server.wait_closed()
+            self._cleanup()
+
+    def animate(self):
+        """
+        Serves the plots until stop() is called, blocking like the other figures' animate().
+        """
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            pass
+
+    def start(self, timeout=10.):
+        """
+        Serves the plots from a background thread instead, returns once the server is listening.
+        :return: URL of the viewer.
+        """
+        self._thread = threading.Thread(target=self.animate, daemon=True)
+        self._thread.start()
+        assert self._ready.wait(timeout), "The server did not start."
+        return f'http://{self.host}:{self.port}/'
+
+    def stop(self, _=None):
+        if self._loop is not None and not self._loop.is_closed():
+            try:
+                self._loop.call_soon_threadsafe(self._stopped.set)
+            except RuntimeError:  # the loop was closed in the meantime
+                pass
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5.)
+
+    def _cleanup(self):
+        if self.recorder is not None:
+            self.recorder.flush()
+        if isinstance(self.data_function, AsyncSource):
+            self.data_function.close()
+
+
+def encode_message(kind, plot_num, x, y_lines):
+    """
+    Binary message of one subplot, little-endian: uint8 kind (REPLACE: the window is these samples, APPEND: add them
+    to the window, dropping samples that fall out of plot_samples), 1 padding byte, uint16 plot_num, uint32 number of
+    samples n, then n float64 x values and n float32 values for every line. Messages are zero-padded to a multiple of
+    8 bytes so that they can be concatenated and still read as aligned typed arrays.
+    """
+    x = np.asarray(x, dtype='<f8')
+    message = _HEADER.pack(kind, plot_num, len(x)) + x.tobytes() + np.asarray(y_lines, dtype='<f4').tobytes()
+    return message + bytes(-len(message) % 8)
+
+
+def decode_message(payload, lines_per_plot):
+    """
+    Reads the messages concatenated in a WebSocket message, the reverse of encode_message().
+    :param lines_per_plot: number of y lines in each subplot, as sent by the server when a viewer connects.
+    :return: list of (kind, plot_num, x, y_lines)
+    """
+    messages = []
+    offset = 0
+    while offset < len(payload):
+        kind, plot_num, n = _HEADER.unpack_from(payload, offset)
+        offset += _HEADER.size
+        x = np.frombuffer(payload, dtype='<f8', count=n, offset=offset)
+        offset += 8 * n
+        num_lines = lines_per_plot[plot_num]
+        y_lines = np.frombuffer(payload, dtype='<f4', count=n * num_lines, offset=offset).reshape(num_lines, n)
+        offset += 4 * n * num_lines
+        offset += -offset % 8
+        messages.append((kind, plot_num, x, y_lines))
+    return messages
+
+
+def _ws_frame(opcode, payload):
+    # Server frames are never masked or fragmented
+    n = len(payload)
+    if n < 126:
+        header = struct.pack('!BB', 0x80 | opcode, n)
+    elif n < 2 ** 16:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, n)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, n)
+    return header + payload
+
+
+class _ProtocolError(ValueError):
+    pass
+
+
+async def _read_ws_frame(reader):
+    """
+    :return: opcode, unmasked payload of the next frame sent by a viewer. Viewers only send control frames, so anything
+    else is rejected before its payload is read.
+    """
+    first, second = await reader.readexactly(2)
+    if not second & 0x80:
+        raise _ProtocolError("Client frames must be masked (RFC 6455 5.1).")
+    n = second & 0x7F
+    if not first & 0x08 or not first & 0x80 or n > 125:
+        raise _ProtocolError("Viewers only send unfragmented control frames of at most 125 bytes (RFC 6455 5.5).")
+    mask = await reader.readexactly(4)
+    payload = await reader.readexactly(n)
+    payload = (np.frombuffer(payload, dtype=np.uint8) ^ np.resize(np.frombuffer(mask, dtype=np.uint8), n)).tobytes()
+    return first & 0x0F, payload
@@ -0,0 +1,121 @@
+import asyncio
+import inspect
+import threading
+
+from .change_tracker import FrozenSeries
+
+
+class AsyncSource:
+    """
+    Adapts an asyncio data source (an async iterator, ex: an async generator, or an async function) to a
+    data_function. The source runs on an event loop of its own in a background thread, or on an event loop you already
+    run, and every frame it produces replaces the previous one. Calling the AsyncSource returns the newest frame
+    without waiting (only the very first call waits for a frame to exist), so slow or bursty I/O never blocks
+    rendering. While no new frame arrives, the same subplots are returned again (as FrozenSeries), which the figures
+    skip.
+    Both figures wrap async sources passed as data_function automatically.
+    """
+
+    def __init__(self, source, interval=0, loop=None, timeout=None):
+        """
+        :param source: async iterator/iterable yielding frames, or async function called with a frame index (0, 1,
+        2, ...) returning one. Frames have the same format as data_function returns. The source ends when the iterator
+        is exhausted or the function raises StopAsyncIteration.
+        :param interval: time (in ms) to sleep between calls of an async function. Not used for async iterators, which
+        set their own pace.
+        :param loop: running event loop (in another thread) to run the source on. None (default) starts a dedicated loop
+        in a daemon thread.
+        :param timeout: maximum time (in s) the first call waits for a frame. None waits forever.
+        """
+        self.source = source
+        self.interval = interval
+        self.timeout = timeout
+        self.frames = 0  # number of frames produced by the source
+        self.exhausted = False
+        self.error = None
+        self._latest = None
+        self._new = False  # the latest frame has not been returned yet
+        self._closed = False
+        self._task = None
+        self._loop = None
+        self._condition = threading.Condition()
+        if loop is None:
+            self._thread = threading.Thread(target=asyncio.run, args=(self._run(), ), daemon=True)
+            self._thread.start()
+        else:
+            self._thread = None
+            asyncio.run_coroutine_threadsafe(self._run(), loop)
+
+    def __call__(self, idx):
+        with self._condition:
+            if self.frames == 0 and not self._condition.wait_for(lambda: self.frames or self.exhausted, self.timeout):
+                raise TimeoutError(f"The async source produced no frame within {self.timeout} s.")
+            if self.error is not None:
+                raise self.error
+            if self.exhausted and not self._new:
+                raise StopIteration
+            self._new = False
+            return self._latest
+
+    async def _run(self):
+        with self._condition:
+            if self._closed:
+                return
+            self._task = asyncio.current_task()
+            self._loop = asyncio.get_running_loop()
+        try:
+            if is_async_source(self.source) == 'function':
+                idx = 0
+                while True:
+                    self._deliver(await self.source(idx))
+                    idx += 1
+                    await asyncio.sleep(self.interval / 1000)
+            else:
+                iterator = self.source.__aiter__() if hasattr(self.source, '__aiter__') else self.source
+                while True:
+                    self._deliver(await iterator.__anext__())
+        except (StopAsyncIteration, asyncio.CancelledError):
+            # Cancellation comes from close(), this is the outermost coroutine of the task so it can end quietly
+            pass
+        except Exception as e:
+            # Re-raised on the GUI thread by __call__()
+            self.error = e
+        finally:
+            with self._condition:
+                self.exhausted = True
+                self._condition.notify_all()
+
+    def _deliver(self, frame):
+        with self._condition:
+            self._latest = [FrozenSeries(plot_data) for plot_data in frame]
+            self._new = True
+            self.frames += 1
+            self._condition.notify_all()
+
+    def close(self):
+        """
+        Cancels the source. A dedicated event loop is shut down as well.
+        """
+        with self._condition:
+            self._closed = True
+            task, loop = self._task, self._loop
+        if task is not None and not self.exhausted:
+            try:
+                loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:  # the loop was closed in the meantime
+                pass
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.)
+
+
+def is_async_source(data_function):
+    """
+    :return: 'function' for async functions (or objects with an async __call__), 'iterator' for async
+    iterators/iterables, None for anything else.
+    """
+    if inspect.iscoroutinefunction(data_function) or \
+            inspect.iscoroutinefunction(getattr(data_function, '__call__', None)):
+        return 'function'
+    if hasattr(data_function, '__aiter__') or hasattr(data_function, '__anext__'):
+        return 'iterator'
+    return None
@@ -0,0 +1,55 @@
+from .ring_buffer import RingBuffer
+
+
+class FrozenSeries(tuple):
+    """
+    x and y series of one subplot that are never modified once returned, ex: the copies made by snapshot() or
+    SharedStreamSource. Sources hand the same FrozenSeries back while a subplot has no new data, which is how a
+    ChangeTracker knows it can skip it.
+    """
+    __slots__ = ()
+
+
+class ChangeTracker:
+    """
+    Tells which subplots of a frame changed since the previous frame, so figures can skip slicing, updating and
+    redrawing the others (ex: a slow sensor plotted next to fast ones).
+    The check is cheap and never looks at the data itself, so a subplot is only reported as unchanged on positive
+    evidence: the very same FrozenSeries as in the previous frame, or RingBuffers whose sample counts did not move.
+    Any other sequence (lists, deques, arrays) can be modified in place and is always reported as changed.
+    """
+
+    def __init__(self):
+        self._states = {}  # subplot index: state of the subplot at the last call
+
+    def changed(self, plot_num, series):
+        """
+        :param plot_num: index of the subplot.
+        :param series: x and y series of the subplot, as returned by data_function.
+        :return: True if any series changed (or may have changed) since the last call for this subplot. Always True
+        on the first call.
+        """
+        if isinstance(series, FrozenSeries):
+            state = series
+        else:
+            state = [(s, s.count) if isinstance(s, RingBuffer) else None for s in series]
+        previous = self._states.get(plot_num)
+        # The states keep a reference to every series, so the identity checks cannot match a recycled id()
+        self._states[plot_num] = state
+        if isinstance(state, FrozenSeries) or isinstance(previous, FrozenSeries):
+            return state is not previous
+        if previous is None or len(previous) != len(state):
+            return True
+        for old, new in zip(previous, state):
+            if old is None or new is None or old[0] is not new[0] or old[1] != new[1]:
+                return True
+        return False
+
+    def reset(self, plot_num=None):
+        """
+        Forgets the state of one subplot (or all of them), so the next call to changed() returns True.
+        """
+        if plot_num is None:
+            self._states.clear()
+        else:
+            self._states.pop(plot_num, None)
@@ -1,6 +1,8 @@
 import itertools
 import numpy as np
 
+from .ring_buffer import RingBuffer
+
 
 def data_slicer(plot_samples, x, y_points):
     """
@@ -14,6 +16,18 @@ def data_slicer(plot_samples, x, y_points):
     :param y_points:
     :return:
     """
+    # RingBuffers already hold NaN-prefilled contiguous storage, so the last plot_samples are returned as views
+    if isinstance(x, RingBuffer) and all(isinstance(y, RingBuffer) for y in y_points):
+        return x.last(plot_samples), tuple(y.last(plot_samples) for y in y_points)
+    # numpy arrays (ex: views of a SharedStreamSource) can be sliced without copying and padded in one go
+    if isinstance(x, np.ndarray) and all(isinstance(y, np.ndarray) for y in y_points):
+        assert all(len(y) == len(x) for y in y_points), "y data must all be of same length within a subplot."
+        len_dif = plot_samples - len(x)
+        if len_dif <= 0:
+            return x[-plot_samples:], tuple(y[-plot_samples:] for y in y_points)
+        padding = np.full(len_dif, np.nan)
+        return np.concatenate((padding, x)), tuple(np.concatenate((padding, y)) for y in y_points)
+
     # Get length of data
     # Assumes all y data within a subplot is of the same length
     y_lengths = [len(y) for y in y_points]
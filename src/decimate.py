@@ -0,0 +1,92 @@
+import numpy as np
+
+
+class MinMaxDecimator:
+    """
+    Envelope-preserving min/max downsampling of a subplot's sliced data.
+    The window is split into buckets and each bucket is reduced to its min and max, so the plotted envelope (spikes
+    included) looks the same as the full data while the number of points only depends on the number of buckets.
+    When the total sample count of the source is known (ex: RingBuffer.count), buckets are aligned to absolute sample
+    positions so the buckets that were already complete in previous frames are reused and only new ones are computed.
+    """
+
+    def __init__(self, window, n_buckets):
+        """
+        :param window: number of samples that will be passed in every call (plot_samples).
+        :param n_buckets: target number of buckets, normally the width of the axes in pixels.
+        """
+        self.window = window
+        self.bucket_size = max(1, -(-window // n_buckets))
+        self._n_slots = window // self.bucket_size + 2
+        self._mins = self._maxs = None  # cached bucket extrema, indexed by absolute bucket number % _n_slots
+        self._last_bucket = None  # absolute number of the newest cached bucket
+        self._last_count = None
+
+    def __call__(self, y_points, count=None):
+        """
+        :param y_points: sliced y data of every line, each of length window.
+        :param count: total number of samples written to the source so far, if known. Enables the bucket cache.
+        :return: (positions, y_decimated). positions are indices into the sliced data (use them to pick x values),
+        two per bucket. y_decimated is a (lines, 2 * buckets) array of alternating bucket min/max.
+        """
+        y = np.asarray(y_points, dtype=np.float64)
+        b = self.bucket_size
+        # absolute position of the first sample of the window, can be negative while the window is NaN padded
+        start = 0 if count is None else count - self.window
+        end = start + self.window
+        first_full = -(-start // b)
+        last_full = end // b - 1
+
+        if count is None:
+            mins, maxs = self._reduce(y, first_full, last_full + 1, start)
+        else:
+            mins, maxs = self._cached(y, first_full, last_full, start, count)
+
+        starts = np.arange(first_full, last_full + 1) * b - start
+        # Partial buckets at either end of the window are cheap, compute them fresh every time
+        if first_full * b > start:
+            head = y[:, :first_full * b - start]
+            mins = np.concatenate((np.fmin.reduce(head, axis=1)[:, None], mins), axis=1)
+            maxs = np.concatenate((np.fmax.reduce(head, axis=1)[:, None], maxs), axis=1)
+            starts = np.concatenate(([0], starts))
+        if (last_full + 1) * b < end:
+            tail = y[:, (last_full + 1) * b - start:]
+            mins = np.concatenate((mins, np.fmin.reduce(tail, axis=1)[:, None]), axis=1)
+            maxs = np.concatenate((maxs, np.fmax.reduce(tail, axis=1)[:, None]), axis=1)
+            starts = np.concatenate((starts, [(last_full + 1) * b - start]))
+
+        positions = np.repeat(starts, 2)
+        y_decimated = np.stack((mins, maxs), axis=-1).reshape(len(y), -1)
+        return positions, y_decimated
+
+    def _reduce(self, y, first, stop, start):
+        """
+        Min/max of the full buckets first...stop-1 in one vectorized pass.
+        """
+        b = self.bucket_size
+        buckets = y[:, first * b - start:stop * b - start].reshape(len(y), stop - first, b)
+        return np.fmin.reduce(buckets, axis=2), np.fmax.reduce(buckets, axis=2)
+
+    def _cached(self, y, first_full, last_full, start, count):
+        if self._mins is None or self._mins.shape[0] != len(y) or self._last_count is None or count < self._last_count:
+            # First call, different source or the source was reset
+            self._mins = np.full((len(y), self._n_slots), np.nan)
+            self._maxs = np.full((len(y), self._n_slots), np.nan)
+            self._last_bucket = first_full - 1
+        self._last_count = count
+        new_first = max(first_full, self._last_bucket + 1)
+        if new_first <= last_full:
+            slots = np.arange(new_first, last_full + 1) % self._n_slots
+            self._mins[:, slots], self._maxs[:, slots] = self._reduce(y, new_first, last_full + 1, start)
+            self._last_bucket = last_full
+        slots = np.arange(first_full, last_full + 1) % self._n_slots
+        return self._mins[:, slots], self._maxs[:, slots]
+
+
+def make_decimator(plot_samples, n_buckets):
+    """
+    :return: a MinMaxDecimator, or None if decimation is disabled or would not reduce the number of points.
+    """
+    if not n_buckets or plot_samples <= 2 * n_buckets:
+        return None
+    return MinMaxDecimator(plot_samples, n_buckets)
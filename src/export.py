@@ -0,0 +1,140 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+import matplotlib.image
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+
+def render_frames(figure, frames):
+    """
+    Drives figure.update_plots() as fast as possible on an Agg canvas, without a GUI event loop.
+    Like the live animation, the axes backgrounds are cached and only the lines are redrawn every frame.
+    :param figure: an AnimatedFigure.
+    :param frames: iterable of frame indices passed to update_plots().
+    :return: generator of RGBA frame buffers (memoryview, height x width x 4). A buffer is only valid until the next
+    frame is rendered.
+    """
+    canvas = FigureCanvasAgg(figure.fig)
+    for line in (line for plot in figure.live_plot for line in plot):
+        line.set_animated(True)
+    canvas.draw()
+    backgrounds = {ax: (ax.viewLim.bounds, canvas.copy_from_bbox(ax.bbox)) for ax in figure.axes}
+    for idx in frames:
+        try:
+            artists = figure.update_plots(idx)
+        except StopIteration:
+            return
+        for ax in {artist.axes for artist in artists}:
+            view, background = backgrounds[ax]
+            if ax.viewLim.bounds != view:
+                # update_plots rescaled and redrew this axes (without the lines), which is the new background
+                backgrounds[ax] = (ax.viewLim.bounds, canvas.copy_from_bbox(ax.bbox))
+            else:
+                canvas.restore_region(background)
+        for artist in artists:
+            artist.axes.draw_artist(artist)
+        yield canvas.buffer_rgba()
+
+
+def write_frames(buffers, path, fps=30, first_frame=0):
+    """
+    Writes RGBA frame buffers to a video or a PNG sequence.
+    Video frames are streamed straight into an ffmpeg pipe (ffmpeg must be installed, matplotlib's
+    animation.ffmpeg_path setting is respected), no intermediate files are written.
+    :param buffers: iterable of RGBA frame buffers, all of the same size (see render_frames()).
+    :param path: output file. A path containing a %d style placeholder (ex: frames/frame_%05d.png) writes one PNG per
+    frame, anything else is passed to ffmpeg, which picks the format from the extension.
+    :param fps: frame rate of the video.
+    :param first_frame: number of the first PNG in the sequence.
+    :return: number of frames written.
+    """
+    if '%' in path:
+        n = 0
+        for n, buffer in enumerate(buffers, start=1):
+            matplotlib.image.imsave(path % (first_frame + n - 1), np.asarray(buffer))
+        return n
+
+    n = 0
+    ffmpeg = None
+    try:
+        for n, buffer in enumerate(buffers, start=1):
+            if ffmpeg is None:
+                height, width, _ = np.asarray(buffer).shape
+                ffmpeg = subprocess.Popen([matplotlib.rcParams['animation.ffmpeg_path'], '-y', '-loglevel', 'error',
+                                           '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', f'{width}x{height}',
+                                           '-r', str(fps), '-i', '-',
+                                           # yuv420p needs even dimensions
+                                           '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-pix_fmt', 'yuv420p', path],
+                                          stdin=subprocess.PIPE)
+            ffmpeg.stdin.write(buffer)
+    finally:
+        if ffmpeg is not None:
+            ffmpeg.stdin.close()
+            if ffmpeg.wait():
+                raise RuntimeError(f"ffmpeg exited with code {ffmpeg.returncode} while writing {path}.")
+    return n
+
+
+def export(figure_factory, path, frames, fps=30, processes=1, warmup=None):
+    """
+    Renders frames offline, optionally splitting the frame range over a pool of processes.
+    Every process builds its own figure with figure_factory and renders a contiguous chunk of frames, which are then
+    joined (PNG sequences need no joining, videos are concatenated by ffmpeg without re-encoding).
+    Before its first frame, every chunk runs update_plots() without rendering over the frames that precede it, so its
+    axis limits, tick labels and subplot schedules are those a single process would have reached at that frame.
+    For more than one process, the data function must be able to produce any frame from its index alone, and
+    figure_factory must be picklable (ex: a module level function).
+    :param figure_factory: function without arguments returning an AnimatedFigure, created with backend='Agg'.
+    :param path: output file, see write_frames().
+    :param frames: range of frame indices.
+    :param fps: frame rate of the video.
+    :param processes: number of processes to render with.
+    :param warmup: number of frames every chunk is warmed up over. None (default) replays every preceding frame, which
+    gives exactly the frames of a single process. A smaller number is faster, but the axes of the first frames of a
+    chunk may differ from a single process' until their next rescale.
+    :return: number of frames written.
+    """
+    if processes <= 1:
+        return _export_chunk(figure_factory, path, frames, fps)
+    chunk_size = -(-len(frames) // processes)
+    chunks = [frames[i:i + chunk_size] for i in range(0, len(frames), chunk_size)]
+    warmups = [frames[0 if warmup is None else max(0, i - warmup):i] for i in range(0, len(frames), chunk_size)]
+    if '%' in path:
+        with ProcessPoolExecutor(processes) as pool:
+            return sum(pool.map(_export_chunk, [figure_factory] * len(chunks), [path] * len(chunks), chunks,
+                                [fps] * len(chunks), warmups))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        extension = os.path.splitext(path)[1]
+        segments = [os.path.join(tmp, f'segment_{i}{extension}') for i in range(len(chunks))]
+        with ProcessPoolExecutor(processes) as pool:
+            n = sum(pool.map(_export_chunk, [figure_factory] * len(chunks), segments, chunks, [fps] * len(chunks),
+                             warmups))
+        playlist = os.path.join(tmp, 'segments.txt')
+        with open(playlist, 'w') as f:
+            f.writelines(f"file '{segment}'\n" for segment in segments)
+        subprocess.run([matplotlib.rcParams['animation.ffmpeg_path'], '-y', '-loglevel', 'error', '-f', 'concat',
+                        '-safe', '0', '-i', playlist, '-c', 'copy', path], check=True)
+    return n
+
+
+def _export_chunk(figure_factory, path, frames, fps, warmup=()):
+    figure = figure_factory()
+    try:
+        try:
+            for idx in warmup:
+                figure.update_plots(idx)
+        except StopIteration:
+            return 0
+        return write_frames(render_frames(figure, frames), path, fps, first_frame=frames[0])
+    finally:
+        figure.stop(None)
+
+
+def ffmpeg_available():
+    return shutil.which(matplotlib.rcParams['animation.ffmpeg_path']) is not None
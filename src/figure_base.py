@@ -0,0 +1,48 @@
+from .stream_source import StreamSource
+
+
+class StreamingMixin:
+    """
+    streaming() and push() of the figures, which work the same for every backend. The figure must keep its
+    data_function in self.data_function.
+    """
+
+    @classmethod
+    def streaming(cls, lines_per_plot, plot_samples, producer=None, **kwargs):
+        """
+        Creates a figure that owns its rolling windows. New samples are added with push() (or returned by producer)
+        instead of data_function returning the whole history every frame.
+        :param lines_per_plot: number of y lines in each subplot, ex: (2, 1).
+        :param plot_samples: same as for __init__(). Also used as the size of the rolling windows.
+        :param producer: optional, see StreamSource.
+        :param kwargs: passed on to __init__().
+        :return: animated plot object.
+        """
+        return cls(StreamSource(lines_per_plot, plot_samples, producer=producer), plot_samples, **kwargs)
+
+    def push(self, subplot, x, y_points):
+        """
+        Appends new samples to a subplot. Only available if data_function is a StreamSource (see streaming()).
+        Can be called from any thread, the new samples show up on the next frame.
+        :param subplot: index of the subplot.
+        :param x: new x value(s).
+        :param y_points: new value(s) for every line in the subplot.
+        :return: None
+        """
+        assert isinstance(self.data_function, StreamSource), "push() requires data_function to be a StreamSource."
+        self.data_function.push(subplot, x, y_points)
+
+
+def per_subplot(value, num_plots, name):
+    """
+    Expands a figure parameter given either once for all subplots or once per subplot.
+    :param value: single value, or a sequence with one value per subplot.
+    :param num_plots: number of subplots returned by data_function.
+    :param name: name of the parameter, for the error message.
+    :return: list with one value per subplot.
+    """
+    try:
+        assert num_plots == len(value), f"Size of {name} is {len(value)} while data_function signature is {num_plots}."
+        return list(value)
+    except TypeError:
+        return [value for _ in range(num_plots)]
@@ -0,0 +1,32 @@
+def grid_positions(num_plots, layout=None):
+    """
+    Places subplots on a grid, filling it row by row.
+    :param num_plots: number of subplots.
+    :param layout: (rows, columns) of the grid. None puts every subplot in a single row.
+    :return: (rows, columns), [(row, column) of every subplot]
+    """
+    rows, columns = (1, num_plots) if layout is None else layout
+    assert rows * columns >= num_plots, \
+        f"A {rows}x{columns} layout has room for {rows * columns} subplots, but data_function signature is {num_plots}."
+    return (rows, columns), [divmod(plot_num, columns) for plot_num in range(num_plots)]
+
+
+def share_groups(share, positions):
+    """
+    Groups the subplots that share an axis.
+    :param share: like matplotlib's sharex/sharey: False or 'none', True or 'all', 'row' or 'col'.
+    :param positions: (row, column) of every subplot, see grid_positions().
+    :return: for every subplot, the tuple of subplots sharing the axis with it (itself included). The first subplot of
+    a group is the one its shared axis is rescaled through.
+    """
+    share = {True: 'all', False: 'none'}.get(share, share)
+    keys = {'none': lambda plot_num, position: plot_num,
+            'all': lambda plot_num, position: 0,
+            'row': lambda plot_num, position: position[0],
+            'col': lambda plot_num, position: position[1]}
+    assert share in keys, f"Axes can be shared with True, False, 'all', 'none', 'row' or 'col', not {share!r}."
+    key = keys[share]
+    groups = {}
+    for plot_num, position in enumerate(positions):
+        groups.setdefault(key(plot_num, position), []).append(plot_num)
+    return [tuple(groups[key(plot_num, position)]) for plot_num, position in enumerate(positions)]
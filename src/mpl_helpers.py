@@ -0,0 +1,72 @@
+"""
+matplotlib subclasses used by AnimatedFigure. They live in their own module so that importing AnimatedFigure does not
+import matplotlib, which only happens once a figure is created.
+"""
+import time
+
+import numpy as np
+from matplotlib import animation
+from matplotlib.ticker import Formatter
+
+
+class TimedAnimation(animation.FuncAnimation):
+    """
+    FuncAnimation that only blits the axes of the artists returned for each frame, so that subplots which did not
+    change keep their last frame instead of being cleared, and adds the time spent drawing/blitting each frame to the
+    'draw' stage of a FrameStats.
+    FuncAnimation restores the background of every axes drawn in the previous frame before calling func. Here the
+    backgrounds are only restored after func, for the axes it returned artists for, and a frame without artists draws
+    nothing instead of falling back to a full draw_idle().
+    """
+
+    def __init__(self, *args, stats=None, **kwargs):
+        self.stats = stats
+        self._pending_artists = []  # drawn by the initial frame, which is not blitted
+        super().__init__(*args, **kwargs)
+
+    def _init_draw(self):
+        super()._init_draw()
+        # Later frames may not return these artists if their data does not change, so blit them with the next one
+        self._pending_artists = list(getattr(self, '_drawn_artists', None) or [])
+
+    def _pre_draw(self, framedata, blit):
+        if not blit or framedata is None:
+            super()._pre_draw(framedata, blit)
+
+    def _post_draw(self, framedata, blit):
+        start = time.perf_counter() if self.stats else None
+        if not blit or framedata is None:
+            super()._post_draw(framedata, blit)
+        else:
+            artists = self._drawn_artists
+            if self._pending_artists:
+                artists = sorted(set(artists).union(self._pending_artists), key=lambda artist: artist.get_zorder())
+                self._pending_artists = []
+            if artists:
+                self._blit_clear(artists)
+                self._blit_draw(artists)
+        if start is not None:
+            self.stats.add('draw', time.perf_counter() - start)
+
+
+class XLabelFormatter(Formatter):
+    """
+    Labels sample index ticks with the x value they correspond to (index * scale), rounded to one significant digit.
+    """
+
+    def __init__(self):
+        self.scale = 1.
+
+    def __call__(self, x, pos=None):
+        return '%g' % round_significant(x * self.scale)
+
+
+def round_significant(values):
+    """
+    Rounds to one significant digit, like float(f'{value:1.1}') but vectorized and without string formatting.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        magnitude = 10. ** np.floor(np.log10(np.abs(values)))
+    magnitude = np.where(np.isfinite(magnitude) & (magnitude > 0), magnitude, 1.)
+    return np.round(values / magnitude) * magnitude
@@ -0,0 +1,155 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from .change_tracker import ChangeTracker, FrozenSeries
+
+
+class ProducerThread(threading.Thread):
+    """
+    Polls data_function in a background thread so that slow acquisition never stalls rendering.
+    Frames go into a bounded queue that drops the oldest frame when full, and the renderer only ever takes the newest
+    one, so a slow renderer does not build up latency either.
+    """
+
+    def __init__(self, data_function, interval, queue_size=2):
+        """
+        :param data_function: same as for AnimatedFigure. Called with frame indices starting at 1.
+        :param interval: interval (in ms) between calls to data_function.
+        :param queue_size: maximum number of frames kept waiting for the renderer.
+        """
+        super().__init__(daemon=True)
+        self.data_function = data_function
+        self.interval = interval
+        self.frames = deque(maxlen=queue_size)
+        self.dropped = 0  # frames that were produced but never rendered
+        self.data_time = 0  # time spent in the last data_function call, in s
+        self.exhausted = False
+        self.error = None
+        self.change_tracker = ChangeTracker()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        idx = 1
+        data = None
+        while not self._stop_event.is_set():
+            try:
+                start = time.perf_counter()
+                new_data = self.data_function(idx)
+                self.data_time = time.perf_counter() - start
+                data = snapshot(new_data, data, self.change_tracker)
+            except StopIteration:
+                self.exhausted = True
+                break
+            except Exception as e:
+                # Re-raised on the GUI thread by latest()
+                self.error = e
+                break
+            with self._lock:
+                if len(self.frames) == self.frames.maxlen:
+                    self.dropped += 1
+                self.frames.append(data)
+            idx += 1
+            self._stop_event.wait(self.interval / 1000)
+
+    def latest(self):
+        """
+        Takes the newest frame out of the queue, dropping any older ones.
+        :return: the newest frame, or None if no frame was produced since the last call.
+        """
+        if self.error is not None:
+            raise self.error
+        with self._lock:
+            if not self.frames:
+                if self.exhausted:
+                    raise StopIteration
+                return None
+            data = self.frames.pop()
+            self.dropped += len(self.frames)
+            self.frames.clear()
+        return data
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class LatestFrame:
+    """
+    Hands frames from a polling thread to the GUI thread, keeping only the newest one: a frame put while the previous
+    one was not taken yet replaces it (and is counted in dropped), so a slow GUI never builds up a backlog of frames.
+    Frames are stored as snapshot() copies, so the polling thread can keep mutating its buffers while the GUI renders.
+    Also measures the render time, which paces polling in adaptive mode (see sleep_time()).
+    """
+
+    def __init__(self, interval, adaptive=False):
+        """
+        :param interval: interval (in ms) between polls of data_function.
+        :param adaptive: stretch the interval to the measured render time.
+        """
+        self.interval = interval
+        self.adaptive = adaptive
+        self.dropped = 0  # frames that were replaced before the GUI took them
+        self.render_time = 0  # moving average of the render time, in ms
+        self.change_tracker = ChangeTracker()
+        self._latest = None
+        self._previous = None  # last snapshot, its copies are reused for unchanged subplots
+        self._lock = threading.Lock()
+
+    def put(self, data):
+        """
+        Stores a frame returned by data_function. Only call from the polling thread.
+        :return: True if no frame was waiting, so the GUI has to be notified. Otherwise it picks this one up instead.
+        """
+        frame = self._previous = snapshot(data, self._previous, self.change_tracker)
+        with self._lock:
+            pending = self._latest is not None
+            if pending:
+                self.dropped += 1
+            self._latest = frame
+        return not pending
+
+    def take(self):
+        """
+        :return: the newest frame, or None if it was already taken.
+        """
+        with self._lock:
+            data, self._latest = self._latest, None
+        return data
+
+    def rendered(self, seconds):
+        """
+        Records how long rendering a frame took.
+        """
+        self.render_time = 0.9 * self.render_time + 0.1 * seconds * 1000
+
+    def sleep_time(self):
+        """
+        :return: time to wait before polling the next frame, in ms. In adaptive mode this is stretched to the measured
+        render time so the producer runs at the rate the GUI can actually display.
+        """
+        if self.adaptive:
+            return max(self.interval, int(self.render_time))
+        return self.interval
+
+
+def snapshot(data, previous=None, change_tracker=None):
+    """
+    Copies every x/y series of a frame into its own array, so the producer can keep mutating its buffers
+    (deques, RingBuffers, ...) while the frame is being rendered.
+    :param data: frame returned by data_function.
+    :param previous: the previous snapshot. Subplots the change_tracker reports as unchanged reuse its copies instead
+    of being copied again, which also lets the figure skip them.
+    :param change_tracker: ChangeTracker fed with every frame, required to reuse previous.
+    :return: list of FrozenSeries of arrays, one per subplot.
+    """
+    frame = []
+    for plot_num, plot_data in enumerate(data):
+        changed = change_tracker is None or change_tracker.changed(plot_num, plot_data)
+        if changed or previous is None:
+            frame.append(FrozenSeries(np.array(series, dtype=np.float64) for series in plot_data))
+        else:
+            frame.append(previous[plot_num])
+    return frame
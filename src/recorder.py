@@ -0,0 +1,209 @@
+import json
+import os
+import queue
+import threading
+from itertools import islice
+
+import numpy as np
+
+from .change_tracker import ChangeTracker
+from .decimate import MinMaxDecimator, make_decimator
+from .ring_buffer import RingBuffer
+
+
+class Recorder:
+    """
+    Keeps the full history of a figure on disk, so that it can be scrolled back to after it left the plotted window.
+    Every series is one append-only float64 column file in the recording directory, memory-mapped and grown
+    chunk_size samples at a time, so appending is a copy into the page cache and reading any range only touches the
+    pages it needs. Nothing is kept in RAM besides the maps themselves.
+    Samples are matched to what was already recorded by their x value: only samples with an x greater than the last
+    recorded one are appended, so x must be increasing (timestamps, sample counters...).
+    record() only copies the new samples on the calling (GUI) thread; converting and writing them is done by a
+    background writer thread, so a frame never waits for the disk.
+    """
+    block_size = 2 ** 20  # samples decimated per pass by read(), bounds its memory use
+
+    def __init__(self, path, lines_per_plot=None, chunk_size=2 ** 16):
+        """
+        :param path: recording directory. An existing recording is opened and appended to, otherwise one is created.
+        :param lines_per_plot: number of y lines in each subplot, ex: (2, 1). Only needed to create a recording.
+        :param chunk_size: number of samples the column files grow by.
+        """
+        self.path = path
+        meta_path = os.path.join(path, 'recording.json')
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            assert lines_per_plot is None or list(lines_per_plot) == meta['lines_per_plot'], \
+                f"Recording {path} has lines_per_plot {meta['lines_per_plot']}, not {list(lines_per_plot)}."
+        else:
+            assert lines_per_plot is not None, "lines_per_plot is required to create a recording."
+            os.makedirs(path, exist_ok=True)
+            meta = {'lines_per_plot': list(lines_per_plot), 'chunk_size': chunk_size}
+            with open(meta_path, 'w') as f:
+                json.dump(meta, f)
+        self.lines_per_plot = tuple(meta['lines_per_plot'])
+        self.chunk_size = meta['chunk_size']
+        # Sample count of every subplot, memory-mapped too so it is on disk as soon as the samples are
+        counts_path = os.path.join(path, 'counts.i64')
+        if not os.path.exists(counts_path):
+            np.zeros(len(self.lines_per_plot), dtype=np.int64).tofile(counts_path)
+        self.counts = np.memmap(counts_path, dtype=np.int64, mode='r+')
+        self._columns = [[self._map(plot_num, column) for column in range(num_y + 1)]
+                         for plot_num, num_y in enumerate(self.lines_per_plot)]
+        self._changes = ChangeTracker()
+        self._seen = [None] * len(self.lines_per_plot)  # (RingBuffer, count) of the last recorded frame
+        # Last x handed to the writer for every subplot, ahead of what is on disk while the writer catches up
+        self._last_x = [self._columns[plot_num][0][count - 1] if count else -np.inf
+                        for plot_num, count in enumerate(self.counts)]
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._writer = None
+        self.error = None
+
+    def _map(self, plot_num, column, size=None):
+        file_path = os.path.join(self.path, f'plot_{plot_num}_{column}.f64')
+        if size is None:
+            size = max(os.path.getsize(file_path) // 8 if os.path.exists(file_path) else 0, self.chunk_size)
+        with open(file_path, 'ab') as f:
+            if f.tell() < size * 8:
+                f.truncate(size * 8)
+        return np.memmap(file_path, dtype=np.float64, mode='r+', shape=(size, ))
+
+    def record(self, data):
+        """
+        Appends the new samples of a frame, as returned by data_function. Subplots that did not change since the last
+        frame (see ChangeTracker) are skipped without reading their data.
+        Only the samples after the last recorded x are read and copied here, from the end of the series, so the cost
+        does not grow with the window; they are written by the background writer thread.
+        Samples that scrolled out of the frame before being recorded are lost, so record every frame.
+        """
+        if self.error is not None:
+            raise self.error
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, daemon=True)
+            self._writer.start()
+        for plot_num, plot_data in enumerate(data):
+            if not self._changes.changed(plot_num, plot_data):
+                continue
+            last = self._last_x[plot_num]
+            if all(isinstance(series, RingBuffer) for series in plot_data):
+                # Only the samples written since the last frame can be new
+                x = plot_data[0]
+                seen = self._seen[plot_num]
+                n = x.count - seen[1] if seen is not None and seen[0] is x else len(x)
+                self._seen[plot_num] = (x, x.count)
+                x_new = x.last(min(n, len(x)))
+                new = np.flatnonzero(x_new > last)
+                if not len(new):
+                    continue
+                first = new[0] - len(x_new)
+                # last() is a view of the live buffer, copy it before handing it to the writer
+                columns = [np.array(series.last(-first)) for series in plot_data]
+            else:
+                # Count the new samples from the end (x is increasing, NaN padding stops the count)
+                n = 0
+                for value in reversed(plot_data[0]):
+                    if not value > last:
+                        break
+                    n += 1
+                if not n:
+                    continue
+                columns = [_tail(series, n) for series in plot_data]
+            self._last_x[plot_num] = columns[0][-1]
+            self._queue.put((plot_num, columns))
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                plot_num, (x, *y_points) = item
+                if self.error is None:
+                    self.append(plot_num, np.asarray(x, dtype=np.float64),
+                                [np.asarray(y, dtype=np.float64) for y in y_points])
+            except Exception as e:
+                # Re-raised on the GUI thread by the next record()
+                self.error = e
+            finally:
+                self._queue.task_done()
+
+    def append(self, plot_num, x, y_points):
+        """
+        Appends samples to a subplot as they are, without comparing them to what was already recorded.
+        :param plot_num: index of the subplot.
+        :param x: array of x values.
+        :param y_points: one array of y values per line, of the same length as x.
+        """
+        with self._lock:
+            columns = self._columns[plot_num]
+            count = int(self.counts[plot_num])
+            n = len(x)
+            if count + n > len(columns[0]):
+                # The old and new maps share the page cache, so the old ones need no flush() first
+                size = -(-(count + n) // self.chunk_size) * self.chunk_size
+                columns[:] = [self._map(plot_num, column, size) for column in range(len(columns))]
+            for column, values in zip(columns, (x, *y_points)):
+                column[count:count + n] = values
+            self.counts[plot_num] = count + n
+
+    def read(self, plot_num, x_start=None, x_end=None, n_buckets=None):
+        """
+        Reads the samples of a subplot with x_start <= x <= x_end.
+        :param plot_num: index of the subplot.
+        :param x_start: first x value, None for the start of the recording.
+        :param x_end: last x value, None for the end of the recording.
+        :param n_buckets: min/max decimate long ranges to about this many buckets (see MinMaxDecimator), ex: the width
+        of the axes in pixels. None returns every sample.
+        :return: x, [y of every line]. Without decimation these are views of the recording, only valid until close().
+        """
+        self._queue.join()  # samples recorded so far are included
+        with self._lock:
+            columns = list(self._columns[plot_num])
+            count = int(self.counts[plot_num])
+        x = columns[0][:count]
+        start = 0 if x_start is None else int(np.searchsorted(x, x_start, side='left'))
+        stop = count if x_end is None else int(np.searchsorted(x, x_end, side='right'))
+        decimator = make_decimator(stop - start, n_buckets)
+        if decimator is None:
+            return np.asarray(x[start:stop]), [np.asarray(column[start:stop]) for column in columns[1:]]
+        # Decimate block by block, with the same bucket size throughout, so only one block is in memory at a time
+        b = decimator.bucket_size
+        block = max(1, self.block_size // b) * b
+        positions, y_decimated = [], []
+        for block_start in range(start, stop, block):
+            block_stop = min(block_start + block, stop)
+            n = block_stop - block_start
+            block_positions, block_y = MinMaxDecimator(n, -(-n // b))([column[block_start:block_stop]
+                                                                      for column in columns[1:]])
+            positions.append(block_positions + block_start)
+            y_decimated.append(block_y)
+        positions = np.concatenate(positions)
+        return x[positions], list(np.concatenate(y_decimated, axis=1))
+
+    def flush(self):
+        """
+        Waits for the writer thread to write the recorded samples, then flushes them to disk.
+        """
+        self._queue.join()
+        for column in (column for plot in self._columns for column in plot):
+            column.flush()
+        self.counts.flush()
+
+    def close(self):
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+        self.flush()
+        self._columns = []
+        self.counts = None
+
+
+def _tail(series, n):
+    """
+    Copies the last n values of a sequence, reading only those (deques cannot be sliced).
+    """
+    return list(islice(reversed(series), n))[::-1]
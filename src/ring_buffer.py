@@ -0,0 +1,211 @@
+import threading
+from collections import deque
+
+import numpy as np
+
+
+class SlidingExtrema:
+    """
+    Running min/max of the last `window` values, kept with two monotonic deques.
+    Each value enters and leaves each deque at most once, so updates are O(1) amortised and reading is O(1).
+    NaN values take up a slot in the window but are otherwise ignored.
+    Appending and reading take a lock, so the extrema can be read while another thread appends.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self._count = 0
+        self._min = deque()  # (index, value) pairs with increasing values
+        self._max = deque()  # (index, value) pairs with decreasing values
+        self._lock = threading.Lock()
+
+    def append(self, value):
+        with self._lock:
+            self._append(value)
+
+    def _append(self, value):
+        idx = self._count
+        self._count += 1
+        if value == value:  # NaN check without the numpy call overhead
+            while self._min and self._min[-1][1] >= value:
+                self._min.pop()
+            self._min.append((idx, value))
+            while self._max and self._max[-1][1] <= value:
+                self._max.pop()
+            self._max.append((idx, value))
+        # Drop values that have left the window
+        expired = idx - self.window
+        while self._min and self._min[0][0] <= expired:
+            self._min.popleft()
+        while self._max and self._max[0][0] <= expired:
+            self._max.popleft()
+
+    def extend(self, values):
+        with self._lock:
+            for value in values:
+                self._append(value)
+
+    def copy(self):
+        other = SlidingExtrema(self.window)
+        with self._lock:
+            other._count, other._min, other._max = self._count, deque(self._min), deque(self._max)
+        return other
+
+    def extrema(self):
+        """
+        :return: (min, max) of the window, (np.nan, np.nan) if it holds no valid values.
+        """
+        with self._lock:
+            if not self._min:
+                return np.nan, np.nan
+            return self._min[0][1], self._max[0][1]
+
+
+class _Extrema:
+    """
+    Extrema of a RingBuffer at the time another one caught up with it, see RingBuffer.catch_up().
+    """
+
+    def __init__(self, extrema):
+        self._extrema = extrema
+
+    def extrema(self):
+        return self._extrema
+
+    def copy(self):
+        return self
+
+
+class RingBuffer:
+    """
+    Fixed-capacity float64 sample buffer that can be returned from data_function instead of lists or deques.
+    Storage is preallocated and prefilled with np.nan. Every sample is written twice (at i and i + capacity), so the
+    most recent samples are always available as one contiguous block and data_slicer can hand a view of it straight to
+    matplotlib/pyqtgraph without building intermediate lists.
+    """
+
+    def __init__(self, capacity, track_extrema=False):
+        """
+        :param capacity: maximum number of samples kept. Should be at least the plot_samples of the subplot it feeds.
+        :param track_extrema: keep a running min/max of the buffer (see extrema()). This lets the y-axis rescale check
+        skip scanning the data, at the cost of a bit of bookkeeping on every append.
+        """
+        assert capacity > 1, "capacity must be >1"
+        self.capacity = int(capacity)
+        self.count = 0  # total number of samples ever written, including those that have been dropped
+        self._index = 0  # next write position, which is also the position of the oldest sample
+        self._data = np.full(2 * self.capacity, np.nan)
+        self._extrema = SlidingExtrema(self.capacity) if track_extrema else None
+
+    @property
+    def tracks_extrema(self):
+        return self._extrema is not None
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def __iter__(self):
+        return iter(self.last(len(self)))
+
+    def __getitem__(self, item):
+        return self.last(len(self))[item]
+
+    def __array__(self, dtype=None, copy=None):
+        return np.array(self.last(len(self)), dtype=dtype, copy=True if copy else None)
+
+    def append(self, value):
+        """
+        Add a single sample, dropping the oldest one if the buffer is full.
+        """
+        self._data[self._index] = self._data[self._index + self.capacity] = value
+        self._index = (self._index + 1) % self.capacity
+        self.count += 1
+        if self._extrema is not None:
+            self._extrema.append(value)
+
+    def extend(self, values):
+        """
+        Add several samples at once. Only the last capacity samples are actually written.
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        n = len(values)
+        if n > self.capacity:
+            values = values[n - self.capacity:]
+            if self._extrema is not None:
+                # Everything currently tracked is about to be overwritten
+                self._extrema = SlidingExtrema(self.capacity)
+        self._write(values)
+        self.count += n
+        if self._extrema is not None:
+            self._extrema.extend(values.tolist())
+
+    def extrema(self):
+        """
+        Running (min, max) over the buffer, ignoring NaN. Only available with track_extrema=True.
+        :return: (min, max), or (np.nan, np.nan) if the buffer holds no valid samples.
+        """
+        assert self._extrema is not None, "RingBuffer was created without track_extrema=True."
+        return self._extrema.extrema()
+
+    def _write(self, values):
+        ring_write(self._data, self._index, values)
+        self._index = (self._index + len(values)) % self.capacity
+
+    def copy(self):
+        """
+        :return: an independent copy of the buffer, ex: to read it while another thread keeps appending to this one.
+        """
+        other = RingBuffer.__new__(RingBuffer)
+        other.capacity, other.count, other._index = self.capacity, self.count, self._index
+        other._data = self._data.copy()
+        other._extrema = None if self._extrema is None else self._extrema.copy()
+        return other
+
+    def catch_up(self, source):
+        """
+        Makes this buffer a copy of source by writing only the samples source received since the previous catch_up(),
+        so keeping a copy of a buffer that another thread appends to costs in proportion to the new samples, not the
+        capacity. Running extrema are copied as their current value. Only update a copy through catch_up().
+        :param source: RingBuffer of the same capacity.
+        """
+        assert source.capacity == self.capacity, "A RingBuffer can only catch up with one of the same capacity."
+        n = min(source.count - self.count, self.capacity) if source.count >= self.count else self.capacity
+        if n > 0:
+            ring_write(self._data, (source._index - n) % self.capacity, source.last(n))
+        self.count, self._index = source.count, source._index
+        if source._extrema is not None:
+            self._extrema = _Extrema(source._extrema.extrema())
+
+    def last(self, n=None):
+        """
+        Returns the last n samples, oldest first.
+        Slots that have not been written yet are np.nan, which is exactly the padding data_slicer needs.
+        This is a zero-copy view (do not modify it) unless n is larger than capacity, in which case a padded copy is made.
+        :param n: number of samples. Defaults to capacity.
+        :return: np.ndarray of length n.
+        """
+        if n is None:
+            n = self.capacity
+        end = self._index + self.capacity
+        if n <= self.capacity:
+            return self._data[end - n:end]
+        return np.concatenate((np.full(n - self.capacity, np.nan), self._data[self._index:end]))
+
+
+def ring_write(storage, index, values):
+    """
+    Writes values into double-written ring storage (see RingBuffer) along its last axis.
+    :param storage: array of shape (..., 2 * capacity).
+    :param index: next write position, in [0, capacity).
+    :param values: array of shape (..., n) with n <= capacity.
+    :return: None
+    """
+    capacity = storage.shape[-1] // 2
+    n = values.shape[-1]
+    # Split the write where it wraps around the end of the ring
+    head = min(n, capacity - index)
+    storage[..., index:index + head] = values[..., :head]
+    storage[..., index + capacity:index + capacity + head] = values[..., :head]
+    if n > head:
+        storage[..., :n - head] = values[..., head:]
+        storage[..., capacity:capacity + n - head] = values[..., head:]
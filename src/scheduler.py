@@ -0,0 +1,64 @@
+class SubplotScheduler:
+    """
+    Decides which subplots are due in a frame, so that every subplot can be refreshed (and have its axes rescaled) at
+    its own interval. The figure ticks at the shortest interval and subplots whose deadline has not arrived yet are
+    skipped entirely, so slow panels cost nothing in between their updates.
+    Deadlines advance by a whole interval each time a subplot is due, which keeps the average rate exact when an
+    interval is not a multiple of the tick interval. A subplot that fell more than an interval behind (ex: slow
+    frames) is not caught up, its next deadline is counted from now.
+    """
+
+    def __init__(self, num_plots, interval, rescale_interval=None, plot_samples=None):
+        """
+        :param num_plots: number of subplots.
+        :param interval: time between updates of each subplot, in ms. Single number or one per subplot.
+        :param rescale_interval: time between checks of the axis limits of each subplot, in ms. Single number or one
+        per subplot. None (default) checks every plot_samples / 2 updates of the subplot.
+        :param plot_samples: number of samples shown in each subplot, only used for the default rescale_interval.
+        """
+        try:
+            assert num_plots == len(interval), \
+                f"Size of interval is {len(interval)} while data_function signature is {num_plots}."
+            self.intervals = list(interval)
+        except TypeError:
+            self.intervals = [interval for _ in range(num_plots)]
+        try:
+            assert num_plots == len(rescale_interval), \
+                f"Size of rescale_interval is {len(rescale_interval)} while data_function signature is {num_plots}."
+            self.rescale_intervals = list(rescale_interval)
+        except TypeError:
+            if rescale_interval is None:
+                self.rescale_intervals = [plot_interval * samples / 2
+                                          for plot_interval, samples in zip(self.intervals, plot_samples)]
+            else:
+                self.rescale_intervals = [rescale_interval for _ in range(num_plots)]
+        assert all(plot_interval > 0 for plot_interval in self.intervals), "interval must be >0"
+        self.interval = min(self.intervals)  # tick interval of the figure
+        self._deadlines = [None] * num_plots  # None: due on the first call
+        self._rescale_deadlines = [None] * num_plots
+
+    def due(self, plot_num, now):
+        """
+        :param plot_num: index of the subplot.
+        :param now: current time in ms, on any clock that is used consistently.
+        :return: True if the subplot should be updated in this frame. Always True on the first call.
+        """
+        return self._advance(self._deadlines, self.intervals[plot_num], plot_num, now, first=True)
+
+    def rescale_due(self, plot_num, now):
+        """
+        Same as due(), for the axis limits check. The first check is one rescale interval after the first call, so the
+        limits are not fitted to the first few samples.
+        """
+        return self._advance(self._rescale_deadlines, self.rescale_intervals[plot_num], plot_num, now, first=False)
+
+    def _advance(self, deadlines, interval, plot_num, now, first):
+        deadline = deadlines[plot_num]
+        if deadline is None:
+            deadlines[plot_num] = now + interval
+            return first
+        # Timers fire with some jitter, anything within half a tick of the deadline is due
+        if now < deadline - self.interval / 2:
+            return False
+        deadlines[plot_num] = deadline + interval if now - deadline < interval else now + interval
+        return True
@@ -0,0 +1,157 @@
+import os
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .change_tracker import FrozenSeries
+from .ring_buffer import ring_write
+
+
+class SharedStreamSource:
+    """
+    Push-based data_function backed by shared memory, for producers running in another process.
+    Works like StreamSource, but the rolling windows live in a multiprocessing.shared_memory block: the producer
+    process push()es samples into it and the figure copies the windows that changed straight out of it every frame, so
+    no data is pickled or sent between the processes. Pass the source itself to the producer process (ex: as an
+    argument of multiprocessing.Process), it is re-attached to the same block by name when unpickled.
+    Every subplot has a sequence counter that is odd while a push is in progress (a seqlock), so the figure always
+    reads a sample count that matches the data that was written. Pushes made while a window is being copied land in
+    the slack behind it; if more than slack samples were pushed in the meantime the copy may be torn and is retried.
+    Only one process may push to a given subplot.
+    """
+    timeout = 1.  # seconds a call waits for a consistent copy of a subplot before raising TimeoutError
+
+    def __init__(self, lines_per_plot, capacity, slack=None, name=None):
+        """
+        :param lines_per_plot: number of y lines in each subplot, ex: (2, 1).
+        :param capacity: number of samples visible in each subplot. Single number or one per subplot.
+        :param slack: extra samples kept behind the visible window, so that pushes made while a window is being copied
+        overwrite samples that are not part of it. Defaults to a quarter of the capacity. A producer that pushes more
+        than slack samples during one copy makes the figure retry it.
+        :param name: name of an existing block to attach to. Normally left out, the block is created.
+        """
+        try:
+            assert len(lines_per_plot) == len(capacity), \
+                f"Size of capacity is {len(capacity)} while lines_per_plot is {len(lines_per_plot)}."
+        except TypeError:
+            capacity = [capacity for _ in lines_per_plot]
+        if slack is None:
+            slack = [plot_capacity // 4 for plot_capacity in capacity]
+        else:
+            try:
+                assert len(slack) == len(capacity), \
+                    f"Size of slack is {len(slack)} while lines_per_plot is {len(lines_per_plot)}."
+            except TypeError:
+                slack = [slack for _ in capacity]
+        self.lines_per_plot = tuple(lines_per_plot)
+        self.capacity = tuple(capacity)
+        self.slack = tuple(slack)
+
+        # Layout: (sequence, count) per subplot, then one (lines + 1, 2 * (capacity + slack)) block per subplot
+        header_size = 2 * len(self.lines_per_plot) * 8
+        shapes = [(num_y + 1, 2 * (plot_capacity + plot_slack))
+                  for num_y, plot_capacity, plot_slack in zip(self.lines_per_plot, self.capacity, self.slack)]
+        size = header_size + sum(rows * columns * 8 for rows, columns in shapes)
+        # Only the creating process frees the block, forked copies of the source just detach
+        self._owner_pid = os.getpid() if name is None else None
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            try:
+                # Attaching processes must not unlink the block when they exit
+                self.shm = shared_memory.SharedMemory(name=name, track=False)
+            except TypeError:  # Python < 3.13
+                self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self._header = np.ndarray((len(self.lines_per_plot), 2), dtype=np.int64, buffer=self.shm.buf)
+        self._blocks = []
+        offset = header_size
+        for shape in shapes:
+            self._blocks.append(np.ndarray(shape, dtype=np.float64, buffer=self.shm.buf, offset=offset))
+            offset += shape[0] * shape[1] * 8
+        # Copies returned by the last call, handed out again while a subplot has no new samples so that the figure can
+        # tell it did not change
+        self._frames = [None] * len(self._blocks)
+        self._counts = [None] * len(self._blocks)
+        if name is None:
+            self._header[:] = 0
+            for block in self._blocks:
+                block[:] = np.nan
+
+    def __getstate__(self):
+        return {'lines_per_plot': self.lines_per_plot, 'capacity': self.capacity, 'slack': self.slack,
+                'name': self.name}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __call__(self, idx):
+        for plot_num, (header, block, plot_capacity, plot_slack) in enumerate(zip(self._header, self._blocks,
+                                                                                   self.capacity, self.slack)):
+            deadline = time.perf_counter() + self.timeout
+            count = self._read_count(header, deadline)
+            if count == self._counts[plot_num]:
+                continue
+            length = block.shape[1] // 2
+            while True:
+                end = count % length + length
+                window = block[:, end - plot_capacity:end].copy()
+                # The oldest copied sample is only overwritten once more than slack samples were pushed after count
+                latest = self._read_count(header, deadline)
+                if latest - count <= plot_slack:
+                    break
+                if time.perf_counter() > deadline:
+                    raise TimeoutError(f"Subplot {plot_num} kept receiving more than slack={plot_slack} samples while "
+                                       f"its window was copied, increase slack.")
+                count = latest
+            self._frames[plot_num] = FrozenSeries(window)
+            self._counts[plot_num] = count
+        return list(self._frames)
+
+    def _read_count(self, header, deadline):
+        while True:
+            sequence = header[0]
+            if sequence % 2 == 0:
+                count = header[1]
+                if header[0] == sequence:
+                    return int(count)
+            if time.perf_counter() > deadline:
+                raise TimeoutError(f"A push has been in progress for over {self.timeout} s, the producer probably died "
+                                   f"in the middle of it.")
+            time.sleep(0)  # a push is in progress
+
+    def push(self, subplot, x, y_points):
+        """
+        Appends new samples to one subplot. Same arguments as StreamSource.push().
+        """
+        block = self._blocks[subplot]
+        assert len(y_points) == block.shape[0] - 1, \
+            f"Subplot {subplot} has {block.shape[0] - 1} lines but {len(y_points)} were pushed."
+        values = np.array([np.asarray(series, dtype=np.float64).ravel() for series in (x, *y_points)])
+        length = block.shape[1] // 2
+        header = self._header[subplot]
+        count = int(header[1])
+        n = values.shape[1]
+        if n > length:
+            values = values[:, n - length:]
+        header[0] += 1  # odd: write in progress
+        ring_write(block, (count + n - values.shape[1]) % length, values)
+        header[1] = count + n
+        header[0] += 1
+
+    def close(self):
+        """
+        Detaches from the shared memory. The process that created the source also frees the block.
+        """
+        self._header = None
+        self._blocks = []
+        self.shm.close()
+        if self._owner_pid == os.getpid():
+            self.shm.unlink()
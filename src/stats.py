@@ -0,0 +1,83 @@
+import time
+from collections import deque
+
+import numpy as np
+
+
+class FrameStats:
+    """
+    Collects per-frame timings of the rendering stages of an AnimatedFigure.
+    Pass an instance as the stats argument of either backend, then read snapshot() or get it pushed to a callback.
+    Figures only take timestamps when a collector is attached, so leaving it out costs nothing.
+    """
+    STAGES = ('data_function', 'data_slicer', 'line_update', 'rescale', 'draw')
+
+    def __init__(self, callback=None, period=1., history=1000):
+        """
+        :param callback: optional function called with snapshot() every period seconds.
+        :param period: seconds between callbacks.
+        :param history: number of most recent frames the statistics are computed over.
+        """
+        self.callback = callback
+        self.period = period
+        self.frames = 0
+        self.dropped = 0  # frames produced but never rendered, set by the figure
+        self._stages = {stage: deque(maxlen=history) for stage in self.STAGES}
+        self._frame_times = deque(maxlen=history)
+        self._current = None  # stage totals of the frame in progress
+        self._frame_start = None
+        self._lap = None
+        self._last_callback = time.perf_counter()
+
+    def start_frame(self):
+        """
+        Closes the previous frame (so the draw that follows a frame update is counted with it) and opens a new one.
+        """
+        now = time.perf_counter()
+        if self._current is not None:
+            for stage, seconds in self._current.items():
+                self._stages[stage].append(seconds)
+            self._frame_times.append(now - self._frame_start)
+            self.frames += 1
+        self._current = dict.fromkeys(self.STAGES, 0.)
+        self._frame_start = self._lap = now
+        if self.callback is not None and now - self._last_callback >= self.period:
+            self._last_callback = now
+            self.callback(self.snapshot())
+
+    def lap(self, stage):
+        """
+        Adds the time since the previous lap (or the start of the frame) to stage.
+        """
+        now = time.perf_counter()
+        self._current[stage] += now - self._lap
+        self._lap = now
+
+    def restart_lap(self):
+        """
+        Starts the next lap now, without adding the time since the previous one to any stage.
+        """
+        self._lap = time.perf_counter()
+
+    def add(self, stage, seconds):
+        if self._current is not None:
+            self._current[stage] += seconds
+
+    def snapshot(self):
+        """
+        :return: dict with the number of frames and dropped frames, the average fps and, for the frame time and every
+        stage, the mean, median, 95th and 99th percentile and maximum in ms over the last history frames.
+        """
+        return {'frames': self.frames,
+                'dropped': self.dropped,
+                'fps': len(self._frame_times) / sum(self._frame_times) if self._frame_times else 0.,
+                'frame_time': _summary(self._frame_times),
+                'stages': {stage: _summary(timings) for stage, timings in self._stages.items()}}
+
+
+def _summary(timings):
+    if not timings:
+        return {'mean': 0., 'p50': 0., 'p95': 0., 'p99': 0., 'max': 0.}
+    ms = np.array(timings) * 1000
+    p50, p95, p99 = np.percentile(ms, (50, 95, 99))
+    return {'mean': ms.mean(), 'p50': p50, 'p95': p95, 'p99': p99, 'max': ms.max()}
@@ -0,0 +1,66 @@
+import threading
+
+from .ring_buffer import RingBuffer
+
+
+class StreamSource:
+    """
+    Push-based data_function. Instead of returning the whole visible history every frame, producers push only the new
+    samples and the rolling window is kept in one RingBuffer per x/y series.
+    Calling the source returns the same nested (x, y1, y2, ...) structure as a regular data_function, so it can be
+    passed to either AnimatedFigure. Pushing costs in proportion to the number of new samples, not the window size.
+    push() can be called from any thread: pushes and calls take the same lock. Every call brings a second set of
+    buffers, only read by the caller, up to date with the samples pushed since the previous call (see
+    RingBuffer.catch_up()) and returns those, so a frame never mixes samples of different pushes and reading it costs in
+    proportion to the new samples too. A frame stays valid until the next call.
+    """
+
+    def __init__(self, lines_per_plot, capacity, producer=None):
+        """
+        :param lines_per_plot: number of y lines in each subplot, ex: (2, 1) for two subplots with 2 and 1 lines.
+        :param capacity: number of samples kept for each subplot. Single number or one per subplot.
+        Normally the same as the plot_samples of the figure.
+        :param producer: optional function called with the frame index every frame. It must return an iterable of
+        (subplot, x, y_points) deltas, which are pushed before the frame is plotted. Raise StopIteration to stop.
+        """
+        try:
+            assert len(lines_per_plot) == len(capacity), \
+                f"Size of capacity is {len(capacity)} while lines_per_plot is {len(lines_per_plot)}."
+        except TypeError:
+            capacity = [capacity for _ in lines_per_plot]
+        self.producer = producer
+        # y buffers keep running extrema so the rescale check does not have to scan the window
+        self.buffers = [(RingBuffer(plot_capacity), ) +
+                        tuple(RingBuffer(plot_capacity, track_extrema=True) for _ in range(num_y))
+                        for num_y, plot_capacity in zip(lines_per_plot, capacity)]
+        self._lock = threading.Lock()
+        # Copies of the buffers returned by every call
+        self._mirrors = [tuple(RingBuffer(buffer.capacity, track_extrema=buffer.tracks_extrema) for buffer in buffers)
+                         for buffers in self.buffers]
+
+    def __call__(self, idx):
+        if self.producer is not None:
+            for subplot, x, y_points in self.producer(idx):
+                self.push(subplot, x, y_points)
+        with self._lock:
+            for buffers, mirrors in zip(self.buffers, self._mirrors):
+                if buffers[0].count != mirrors[0].count:
+                    for buffer, mirror in zip(buffers, mirrors):
+                        mirror.catch_up(buffer)
+        return list(self._mirrors)
+
+    def push(self, subplot, x, y_points):
+        """
+        Appends new samples to one subplot.
+        :param subplot: index of the subplot.
+        :param x: new x value(s), a single number or an iterable.
+        :param y_points: one new value (or iterable of values, same length as x) for every line in the subplot.
+        :return: None
+        """
+        x_buffer, *y_buffers = self.buffers[subplot]
+        assert len(y_points) == len(y_buffers), \
+            f"Subplot {subplot} has {len(y_buffers)} lines but {len(y_points)} were pushed."
+        with self._lock:
+            x_buffer.extend(x)
+            for buffer, y in zip(y_buffers, y_points):
+                buffer.extend(y)
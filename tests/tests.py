@@ -1,13 +1,43 @@
+import asyncio
+import base64
+import contextlib
+import io
+import multiprocessing
+import os
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
+import matplotlib.image
 import numpy as np
 from collections import deque
 from itertools import islice
 
-from src.AnimatedFigureQt import AnimatedFigure as AnimFigQt
 from src.AnimatedFigure import AnimatedFigure as AnimFigMpl
+from src.AnimatedFigureWeb import AnimatedFigure as AnimFigWeb, APPEND, REPLACE, decode_message, encode_message
+from src.async_source import AsyncSource
+from src.change_tracker import ChangeTracker, FrozenSeries
 from src.data_slicer import data_slicer
+from src.producer import LatestFrame, ProducerThread, snapshot
+from src.decimate import MinMaxDecimator
+from src.export import export, ffmpeg_available
+from src.layout import grid_positions, share_groups
+from src.recorder import Recorder
+from src.ring_buffer import RingBuffer
+from src.scheduler import SubplotScheduler
+from src.shared_source import SharedStreamSource
+from src.stats import FrameStats
+from src.stream_source import StreamSource
 
-frameworks = (AnimFigQt, AnimFigMpl)
+try:
+    from src.AnimatedFigureQt import AnimatedFigure as AnimFigQt
+    frameworks = (AnimFigQt, AnimFigMpl)
+except ImportError:  # the Qt backend is an optional extra
+    frameworks = (AnimFigMpl, )
 
 
 class TestSlice(unittest.TestCase):
@@ -29,6 +59,715 @@ class TestSlice(unittest.TestCase):
                                 for y in y_data_sliced:
                                     self.assertTrue(len(x_sliced) == len(y) == plot_samples, "Slicing produced unexpected lengths")
 
+class TestRingBuffer(unittest.TestCase):
+
+    def test_append_extend(self):
+        for capacity in [2, 7, 50]:
+            for chunk in [1, 3, 10, 100]:
+                with self.subTest(name=f"capacity: {capacity}, chunk: {chunk}"):
+                    buffer = RingBuffer(capacity)
+                    reference = deque(maxlen=capacity)
+                    for start in range(0, 300, chunk):
+                        values = np.arange(start, start + chunk, dtype=float)
+                        if chunk == 1:
+                            buffer.append(values[0])
+                        else:
+                            buffer.extend(values)
+                        reference.extend(values)
+                        self.assertEqual(len(buffer), len(reference))
+                        np.testing.assert_array_equal(np.asarray(buffer), np.array(reference))
+
+    def test_last_is_padded_view(self):
+        buffer = RingBuffer(10)
+        buffer.extend([1., 2., 3.])
+        last = buffer.last(5)
+        np.testing.assert_array_equal(last, [np.nan, np.nan, 1., 2., 3.])
+        self.assertIsNotNone(last.base, "last() should not copy when n <= capacity")
+        np.testing.assert_array_equal(buffer.last(12)[-3:], [1., 2., 3.])
+        self.assertEqual(len(buffer.last(12)), 12)
+
+    def test_extrema(self):
+        rng = np.random.default_rng(0)
+        values = rng.normal(size=500)
+        values[rng.integers(0, 500, 50)] = np.nan
+        for capacity in [2, 10, 100]:
+            with self.subTest(name=f"capacity: {capacity}"):
+                buffer = RingBuffer(capacity, track_extrema=True)
+                for start in range(0, 500, 7):
+                    buffer.extend(values[start:start + 7])
+                    window = np.asarray(buffer)
+                    if np.all(np.isnan(window)):
+                        self.assertTrue(np.all(np.isnan(buffer.extrema())))
+                    else:
+                        self.assertEqual(buffer.extrema(), (np.nanmin(window), np.nanmax(window)))
+
+    def test_threaded_extrema(self):
+        buffer = RingBuffer(10, track_extrema=True)
+        thread = threading.Thread(target=lambda: [buffer.append(i) for i in range(200000)])
+        thread.start()
+        while thread.is_alive():
+            low, high = buffer.extrema()
+            self.assertFalse(low > high)
+        thread.join()
+        self.assertEqual(buffer.extrema(), (199990, 199999))
+
+    def test_catch_up(self):
+        source, copy = RingBuffer(10, track_extrema=True), RingBuffer(10, track_extrema=True)
+        rng = np.random.default_rng(0)
+        for n in [0, 3, 1, 9, 10, 25, 4]:  # wraps around, and falls behind by more than the capacity
+            source.extend(rng.normal(size=n))
+            copy.catch_up(source)
+            self.assertEqual(copy.count, source.count)
+            np.testing.assert_array_equal(copy.last(), source.last())
+            self.assertEqual(copy.extrema(), source.extrema())
+        source.append(100.)
+        self.assertNotEqual(copy.extrema(), source.extrema())  # the copy keeps the extrema it caught up with
+
+    def test_slicer(self):
+        x, y = RingBuffer(100), RingBuffer(100)
+        for i in range(150):
+            x.append(i)
+            y.append(i ** 2)
+            for plot_samples in [2, 50, 100]:
+                x_sliced, (y_sliced, ) = data_slicer(plot_samples, x, [y])
+                self.assertTrue(len(x_sliced) == len(y_sliced) == plot_samples, "Slicing produced unexpected lengths")
+                self.assertEqual(x_sliced[-1], i)
+                self.assertEqual(y_sliced[-1], i ** 2)
+
+
+class TestStreamSource(unittest.TestCase):
+
+    def test_push(self):
+        source = StreamSource(lines_per_plot=(2, 1), capacity=(50, 20))
+        for i in range(100):
+            source.push(0, i, (i * 2, i ** 2))
+            if i % 10 == 0:
+                source.push(1, range(i, i + 10), (np.arange(i, i + 10) * -1, ))
+        (x0, y01, y02), (x1, y11) = source(100)
+        self.assertEqual(len(x0), 50)
+        self.assertEqual(len(x1), 20)
+        np.testing.assert_array_equal(np.asarray(y02), np.arange(50, 100) ** 2)
+        np.testing.assert_array_equal(np.asarray(y11), -np.asarray(x1))
+
+    def test_producer(self):
+        source = StreamSource(lines_per_plot=(1, ), capacity=10, producer=lambda i: [(0, [i, i + .5], ([i, -i], ))])
+        for i in range(20):
+            ((x, y), ) = source(i)
+        x_sliced, (y_sliced, ) = data_slicer(10, x, [y])
+        self.assertEqual(x_sliced[-1], 19.5)
+        self.assertEqual(y_sliced[-1], -19)
+
+    def test_streaming_figures(self):
+        for figure in AnimFigMpl, AnimFigWeb:
+            with self.subTest(figure=figure.__module__):
+                kwargs = {'backend': 'Agg'} if figure is AnimFigMpl else {'port': 0}
+                an = figure.streaming((2, 1), plot_samples=(10, 20), **kwargs)
+                self.assertEqual(an.plot_samples, [10, 20])
+                an.push(1, [1, 2], ([3, 4], ))
+                (x, y), = an.data_function(1)[1:]
+                np.testing.assert_array_equal(x[-2:], [1, 2])
+                self.assertEqual(x.capacity, 20)
+                an.stop(None)
+                with self.assertRaises(AssertionError):
+                    figure.streaming((2, 1), plot_samples=(10, 20, 30), **kwargs)
+        an = AnimFigMpl(lambda i: [([0, 1], [0, 1])], plot_samples=[2], backend='Agg')
+        with self.assertRaises(AssertionError):  # not a StreamSource
+            an.push(0, 1, (1, ))
+        an.stop(None)
+        with self.assertRaises(AssertionError):
+            AnimFigMpl(lambda i: [([0, 1], [0, 1])], plot_samples=[1], backend='Agg')
+
+    def test_threaded_push(self):
+        source = StreamSource(lines_per_plot=(2, ), capacity=100)
+        thread = threading.Thread(target=lambda: [source.push(0, range(i, i + 3), (range(i, i + 3), range(-i, -i - 3, -1)))
+                                                  for i in range(0, 60000, 3)])
+        thread.start()
+        while thread.is_alive():
+            (x, y1, y2), = source(0)
+            x_sliced, (y1_sliced, y2_sliced) = data_slicer(100, x, [y1, y2])
+            self.assertEqual(len(x), len(y1))
+            self.assertEqual(x.count, y2.count)
+            np.testing.assert_array_equal(y1_sliced, x_sliced)
+            np.testing.assert_array_equal(y2_sliced, -x_sliced)
+        thread.join()
+
+
+class TestDecimate(unittest.TestCase):
+
+    def test_envelope(self):
+        rng = np.random.default_rng(0)
+        for window, n_buckets in [(1000, 100), (997, 50), (100, 7)]:
+            with self.subTest(name=f"window: {window}, n_buckets: {n_buckets}"):
+                y = rng.normal(size=window)
+                decimator = MinMaxDecimator(window, n_buckets)
+                positions, (y_decimated, ) = decimator([y])
+                self.assertEqual(len(positions), len(y_decimated))
+                self.assertLessEqual(len(y_decimated), 2 * (n_buckets + 1))
+                self.assertEqual(y_decimated.min(), y.min())
+                self.assertEqual(y_decimated.max(), y.max())
+                # every bucket's min/max must lie within the samples it starts at
+                for position, value in zip(positions, y_decimated):
+                    self.assertIn(value, y[position:position + decimator.bucket_size])
+
+    def test_cache(self):
+        # Reusing cached buckets must give the same result as decimating from scratch
+        window, rng = 1000, np.random.default_rng(1)
+        x, y = RingBuffer(window), RingBuffer(window)
+        cached, fresh = MinMaxDecimator(window, 64), MinMaxDecimator(window, 64)
+        for i in range(100):
+            new = rng.integers(1, 40)
+            x.extend(np.arange(x.count, x.count + new))
+            y.extend(rng.normal(size=new))
+            _, y_sliced = data_slicer(window, x, [y])
+            positions, y_cached = cached(y_sliced, y.count)
+            fresh._mins = None
+            positions_fresh, y_fresh = fresh(y_sliced, y.count)
+            np.testing.assert_array_equal(positions, positions_fresh)
+            np.testing.assert_array_equal(y_cached, y_fresh)
+
+
+class TestSharedStreamSource(unittest.TestCase):
+
+    def test_push_from_process(self):
+        with SharedStreamSource(lines_per_plot=(2, 1), capacity=(50, 20)) as source:
+            producer = multiprocessing.Process(target=push_samples, args=(source, 500))
+            producer.start()
+            producer.join()
+            self.assertEqual(producer.exitcode, 0)
+            (x0, y01, y02), (x1, y11) = source(0)
+            self.assertEqual(len(x0), 50)
+            np.testing.assert_array_equal(x0, np.arange(450, 500))
+            np.testing.assert_array_equal(y02, np.arange(450, 500) ** 2)
+            np.testing.assert_array_equal(x1, np.arange(480, 500))
+            # the window copied out of shared memory is sliced without copying it again
+            x_sliced, (y_sliced, ) = data_slicer(20, x1, [y11])
+            self.assertTrue(np.shares_memory(y_sliced, y11))
+
+    def test_padding(self):
+        with SharedStreamSource(lines_per_plot=(1, ), capacity=10) as source:
+            source.push(0, [1, 2, 3], ([4, 5, 6], ))
+            ((x, y), ) = source(0)
+            np.testing.assert_array_equal(x, [np.nan] * 7 + [1, 2, 3])
+            # more than the whole ring at once
+            source.push(0, np.arange(100), (np.arange(100), ))
+            ((x, y), ) = source(0)
+            np.testing.assert_array_equal(x, np.arange(90, 100))
+            # without new samples the same copies are returned, so the figure can skip the subplot
+            self.assertIs(source(0)[0], source(0)[0])
+
+    def test_consistent_while_pushing(self):
+        with SharedStreamSource(lines_per_plot=(1, ), capacity=1000, slack=100) as source:
+            thread = threading.Thread(target=lambda: [source.push(0, np.arange(i, i + 10), (-np.arange(i, i + 10), ))
+                                                      for i in range(0, 300000, 10)])
+            thread.start()
+            while thread.is_alive():
+                ((x, y), ) = source(0)
+                np.testing.assert_array_equal(y, -x)
+            thread.join()
+
+    def test_dead_producer(self):
+        with SharedStreamSource(lines_per_plot=(1, ), capacity=10) as source:
+            source.timeout = 0.05
+            source._header[0, 0] += 1  # a push that never finishes
+            with self.assertRaises(TimeoutError):
+                source(0)
+
+
+class TestProducerThread(unittest.TestCase):
+
+    def test_latest(self):
+        buffer = deque(maxlen=10)
+
+        def data_function(i):
+            if i > 50:
+                raise StopIteration
+            buffer.append(i)
+            return [(buffer, buffer)]
+
+        producer = ProducerThread(data_function, interval=0, queue_size=2)
+        producer.start()
+        producer.join()
+        self.assertTrue(producer.exhausted)
+        ((x, y), ) = producer.latest()
+        # Only the newest frame is returned and it is a copy, not the producer's deque
+        np.testing.assert_array_equal(x, np.arange(41, 51))
+        self.assertIsInstance(y, np.ndarray)
+        self.assertEqual(producer.dropped, 49)
+        with self.assertRaises(StopIteration):
+            producer.latest()
+
+
+class TestLatestFrame(unittest.TestCase):
+
+    def test_coalescing(self):
+        frames = LatestFrame(interval=10)
+        buffer = deque([1., 2.])
+        self.assertTrue(frames.put([(buffer, buffer)]))
+        buffer.append(3.)
+        # the GUI has not taken the first frame yet: no new signal, the frame is replaced
+        self.assertFalse(frames.put([(buffer, buffer)]))
+        self.assertEqual(frames.dropped, 1)
+        buffer.append(4.)  # the producer keeps mutating its buffers
+        (x, y), = frames.take()
+        np.testing.assert_array_equal(x, [1, 2, 3])
+        self.assertIsNone(frames.take())
+        self.assertTrue(frames.put([(buffer, buffer)]))
+        self.assertEqual(frames.dropped, 1)
+
+    def test_unchanged_reused(self):
+        frames = LatestFrame(interval=10)
+        fast, slow = RingBuffer(10), RingBuffer(10)
+        frames.put([(fast, fast), (slow, slow)])
+        first = frames.take()
+        fast.append(1.)
+        frames.put([(fast, fast), (slow, slow)])
+        second = frames.take()
+        self.assertIsNot(second[0], first[0])
+        self.assertIs(second[1], first[1])
+
+    def test_sleep_time(self):
+        fixed, adaptive = LatestFrame(interval=10), LatestFrame(interval=10, adaptive=True)
+        for frames in fixed, adaptive:
+            for _ in range(100):
+                frames.rendered(0.05)
+        self.assertEqual(fixed.sleep_time(), 10)
+        self.assertAlmostEqual(adaptive.render_time, 50, delta=0.1)
+        self.assertEqual(adaptive.sleep_time(), 49)  # int() of the moving average, still converging
+        adaptive.render_time = 2
+        self.assertEqual(adaptive.sleep_time(), 10)
+
+
+class TestAsyncSource(unittest.TestCase):
+
+    def test_iterator(self):
+        async def frames():
+            for i in range(5):
+                await asyncio.sleep(0.001)
+                yield [(np.arange(i + 1), np.arange(i + 1) ** 2)]
+
+        source = AsyncSource(frames())
+        first = source(0)  # waits for the first frame
+        self.assertEqual(len(first[0][0]), 1)
+        source._thread.join()
+        # only the newest frame is returned, then the source is exhausted
+        ((x, y), ) = source(1)
+        np.testing.assert_array_equal(y, np.arange(5) ** 2)
+        with self.assertRaises(StopIteration):
+            source(2)
+
+    def test_function(self):
+        async def data_function(i):
+            if i == 50:
+                raise StopAsyncIteration
+            await asyncio.sleep(0)
+            return return_multi(i=i + 2, num_y=1, num_plots=1, x=list(range(60)), y=list(range(60)), maxpoints=60)
+
+        # figures wrap async functions on their own
+        an = AnimFigMpl(data_function, plot_samples=10, backend='Agg')
+        self.assertIsInstance(an.data_function, AsyncSource)
+        with self.assertRaises(StopIteration):
+            for i in range(1, 10000):
+                an.update_plots(i)
+                an.data_function._thread.join(0.001)
+        self.assertEqual(an.data_function.frames, 50)
+
+    def test_close(self):
+        async def forever():
+            while True:
+                await asyncio.sleep(0.001)
+                yield [([0.], [0.])]
+
+        source = AsyncSource(forever())
+        source(0)
+        source.close()
+        self.assertFalse(source._thread.is_alive())
+        self.assertIsNone(source.error)
+
+    def test_error(self):
+        async def data_function(i):
+            raise ValueError('sensor offline')
+
+        with self.assertRaises(ValueError):
+            AsyncSource(data_function)(0)
+
+
+class TestChangeTracker(unittest.TestCase):
+
+    def test_changed(self):
+        tracker = ChangeTracker()
+        x, y = RingBuffer(10), RingBuffer(10)
+        self.assertTrue(tracker.changed(0, (x, y)))
+        self.assertFalse(tracker.changed(0, (x, y)))
+        y.append(1)
+        self.assertTrue(tracker.changed(0, (x, y)))
+        self.assertFalse(tracker.changed(0, (x, y)))
+        self.assertTrue(tracker.changed(0, (x, y.copy())))  # equal data, but another buffer
+        tracker.reset()
+        self.assertTrue(tracker.changed(0, (x, y)))
+        # other sequences may have been modified in place
+        y = deque([1., 2.], maxlen=2)
+        self.assertTrue(tracker.changed(0, (x, y)))
+        self.assertTrue(tracker.changed(0, (x, y)))
+        frozen = FrozenSeries((np.arange(2.), np.arange(2.)))
+        self.assertTrue(tracker.changed(0, frozen))
+        self.assertFalse(tracker.changed(0, frozen))
+        self.assertTrue(tracker.changed(0, FrozenSeries(frozen)))
+
+    def test_scrolled_in_place(self):
+        # a fixed x and a y array scrolled in place look the same from their identity, length and last value
+        x, y = np.arange(20.), np.zeros(20)
+        an = AnimFigMpl(lambda i: [(x, y)], plot_samples=20, backend='Agg')
+        for i in range(1, 12):
+            y[:-1] = y[1:]
+            y[-1] = i // 3 % 2  # the last value often repeats
+            self.assertEqual(an.update_plots(i), an.live_plot[0])
+            np.testing.assert_array_equal(an.live_plot[0][0].get_ydata(), y)
+        an.stop(None)
+
+    def test_update_plots(self):
+        fast, slow = StreamSource((1, 1), 50), StreamSource((1, ), 50)
+        an = AnimFigMpl(lambda i: fast(i)[:1] + slow(i), plot_samples=50, backend='Agg')
+        an.update_plots(1)
+        fast.push(0, 1, (1, ))
+        self.assertEqual(an.update_plots(2), an.live_plot[0])
+        self.assertEqual(an.update_plots(3), [])
+        slow.push(0, 1, (1, ))
+        self.assertEqual(an.update_plots(4), an.live_plot[1])
+        an.stop(None)
+
+    def test_snapshot(self):
+        tracker, x, y = ChangeTracker(), RingBuffer(10), RingBuffer(10)
+        first = snapshot([(x, y), (x, y)], None, tracker)
+        second = snapshot([(x, y), (x, [1.])], first, tracker)
+        self.assertIs(second[0], first[0])  # unchanged subplots reuse the previous copy
+        self.assertIsNot(second[1], first[1])
+
+
+class TestRecorder(unittest.TestCase):
+
+    def test_record(self):
+        x, y = deque(maxlen=50), deque(maxlen=50)
+        with tempfile.TemporaryDirectory() as tmp:
+            recorder = Recorder(tmp, (1, ), chunk_size=64)
+            for i in range(1000):
+                x.append(i)
+                y.append(-i)
+                if i % 7 == 0:  # samples between recorded frames are picked up, not duplicated
+                    recorder.record([(x, y)])
+            recorder.close()
+            # reopened recordings keep their samples
+            recorder = Recorder(tmp)
+            x_read, (y_read, ) = recorder.read(0)
+            np.testing.assert_array_equal(x_read, np.arange(995))
+            np.testing.assert_array_equal(y_read, -np.arange(995))
+            x_read, (y_read, ) = recorder.read(0, 100, 199)
+            np.testing.assert_array_equal(x_read, np.arange(100, 200))
+            recorder.close()
+
+    def test_background_writer(self):
+        x, y = RingBuffer(50), RingBuffer(50)
+        with tempfile.TemporaryDirectory() as tmp:
+            recorder = Recorder(tmp, (1, ), chunk_size=64)
+            writers = set()
+            append = recorder.append
+
+            def spy(*args):
+                writers.add(threading.current_thread())
+                append(*args)
+            recorder.append = spy
+            flush = np.memmap.flush
+            np.memmap.flush = lambda column: self.fail("flush() while recording")
+            try:
+                for i in range(1000):  # grows the column files several times
+                    x.append(i)
+                    y.append(-i)
+                    if i % 7 == 0:
+                        recorder.record([(x, y)])
+            finally:
+                np.memmap.flush = flush
+            x_read, (y_read, ) = recorder.read(0)
+            np.testing.assert_array_equal(x_read, np.arange(995))
+            np.testing.assert_array_equal(y_read, -np.arange(995))
+            self.assertEqual(len(writers), 1)
+            self.assertNotIn(threading.current_thread(), writers)
+            recorder.close()
+
+    def test_decimated_read(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            recorder = Recorder(tmp, (1, ))
+            recorder.block_size = 1000  # several blocks
+            y = np.random.default_rng(0).normal(size=10000)
+            recorder.append(0, np.arange(10000.), [y])
+            x_read, (y_read, ) = recorder.read(0, n_buckets=100)
+            self.assertLessEqual(len(y_read), 2 * 101)
+            self.assertEqual(y_read.min(), y.min())
+            self.assertEqual(y_read.max(), y.max())
+            # two points per bucket, at the start of the bucket
+            self.assertEqual(len(x_read), len(y_read))
+            self.assertTrue(np.all(np.diff(x_read) >= 0))
+            recorder.close()
+
+    def test_scrollback(self):
+        source = StreamSource((1, ), 50)
+        with tempfile.TemporaryDirectory() as tmp:
+            an = AnimFigMpl(source, plot_samples=50, backend='Agg', recorder=tmp)
+            for i in range(1, 200):
+                source.push(0, i, (i, ))
+                an.update_plots(i)
+            an.scrollback(10, 20)
+            source.push(0, 200, (200, ))
+            self.assertEqual(an.update_plots(200), an.live_plot[0])
+            np.testing.assert_array_equal(an.live_plot[0][0].get_xdata(), np.arange(10, 21))
+            self.assertEqual(an.update_plots(201), [])  # paused
+            an.resume()
+            source.push(0, 201, (201, ))
+            an.update_plots(202)
+            np.testing.assert_array_equal(an.live_plot[0][0].get_ydata(), np.arange(152, 202))
+            an.recorder.flush()
+            self.assertEqual(an.recorder.counts[0], 201)
+            an.stop(None)
+            an.recorder.close()
+
+
+class TestBatched(unittest.TestCase):
+
+    def test_update_plots(self):
+        source = StreamSource((3, ), 50)
+        an = AnimFigMpl(source, plot_samples=50, backend='Agg', batched=True)
+        (collection, ), = an.live_plot
+        for i in range(1, 60):
+            source.push(0, i, (i, 2 * i, 3 * i))
+            self.assertEqual(an.update_plots(i), [collection])
+        paths = collection.get_paths()
+        self.assertEqual(len(paths), 3)
+        np.testing.assert_array_equal(paths[2].vertices[:, 0], np.arange(50))
+        np.testing.assert_array_equal(paths[2].vertices[:, 1], 3 * np.arange(10, 60))
+        # the paths are updated in place, not rebuilt
+        source.push(0, 60, (60, 120, 180))
+        an.update_plots(60)
+        self.assertIs(collection.get_paths()[2], paths[2])
+        self.assertEqual(paths[2].vertices[-1, 1], 180)
+        an.fig.canvas.draw()
+        an.stop(None)
+
+    def test_decimated(self):
+        source = StreamSource((2, ), 1000)
+        an = AnimFigMpl(source, plot_samples=1000, backend='Agg', batched=True, decimate=50, time_axis=True)
+        source.push(0, np.arange(1000), (np.sin(np.arange(1000)), np.arange(1000)))
+        an.update_plots(1)
+        vertices = an.live_plot[0][0].get_paths()[1].vertices
+        self.assertLessEqual(len(vertices), 2 * 51)
+        self.assertEqual(vertices[:, 1].max(), 999)
+        an.stop(None)
+
+
+class TestScheduler(unittest.TestCase):
+
+    def test_due(self):
+        scheduler = SubplotScheduler(2, (10, 25), rescale_interval=100)
+        due = np.array([[scheduler.due(plot_num, now) for plot_num in range(2)] for now in range(0, 1000, 10)])
+        self.assertTrue(due[:, 0].all())
+        self.assertEqual(due[:, 1].sum(), 1000 // 25)
+        # the first rescale check is one rescale interval in
+        self.assertFalse(scheduler.rescale_due(0, 0))
+        self.assertFalse(scheduler.rescale_due(0, 90))
+        self.assertTrue(scheduler.rescale_due(0, 100))
+
+    def test_update_plots(self):
+        source = StreamSource((1, 1), 50)
+        an = AnimFigMpl(source, plot_samples=50, interval=(5, 20), backend='Agg')
+        updated = []
+        for i in range(1, 41):
+            source.push(0, i, (i, ))
+            source.push(1, i, (i, ))
+            updated.append(an.live_plot[1][0] in an.update_plots(i))
+        self.assertEqual(sum(updated), 10)
+        self.assertEqual(an.interval, 5)
+        an.stop(None)
+
+    def test_wall_clock(self):
+        source = StreamSource((1, 1), 50)
+        an = AnimFigMpl(source, plot_samples=50, interval=(1, 1000), backend='Agg')
+        now = [0.]
+        an.clock = lambda: now[0]
+        updated = []
+        # frames come every 20 ms instead of every 1 ms
+        for i in range(1, 201):
+            now[0] = i * 20.
+            source.push(0, i, (i, ))
+            source.push(1, i, (i, ))
+            updated.append(an.live_plot[1][0] in an.update_plots(i))
+        # the 1 s subplot follows the clock, not the number of frames
+        self.assertEqual(sum(updated), 4)
+        an.stop(None)
+
+    def test_full_draw(self):
+        source = StreamSource((1, 1), 50)
+        an = AnimFigMpl(source, plot_samples=50, interval=(5, 1000), backend='Agg')
+        for i in range(1, 4):
+            source.push(0, i, (i, ))
+            an.update_plots(i)
+        # a full draw does not draw the animated lines, the slow subplot must be blitted again although it is not due
+        an.fig.canvas.draw()
+        source.push(0, 4, (4, ))
+        self.assertEqual(an.update_plots(4), an.live_plot[0] + an.live_plot[1])
+        source.push(0, 5, (5, ))
+        self.assertEqual(an.update_plots(5), an.live_plot[0])
+        an.stop(None)
+
+    def test_full_draw_threaded(self):
+        release = threading.Event()
+
+        def data_function(i):
+            if i > 1:
+                release.wait()  # a slow producer
+            return return_multi(i=i + 1, num_y=1, num_plots=2, x=[0, 1], y=[0, 1], maxpoints=2)
+        an = AnimFigMpl(data_function, plot_samples=2, backend='Agg')
+        an.producer = ProducerThread(data_function, interval=0)
+        an.producer.start()
+        while not an.update_plots(1):
+            pass
+        # the lines hidden by a full draw are blitted again without waiting for the next frame
+        an.fig.canvas.draw()
+        self.assertEqual(an.update_plots(2), an.live_plot[0] + an.live_plot[1])
+        self.assertEqual(an.update_plots(3), [])
+        release.set()
+        an.producer.stop()
+        an.stop(None)
+
+
+class TestLayout(unittest.TestCase):
+
+    def test_groups(self):
+        shape, positions = grid_positions(7, (3, 3))
+        self.assertEqual(shape, (3, 3))
+        self.assertEqual(positions[4], (1, 1))
+        self.assertEqual(share_groups(False, positions)[4], (4, ))
+        self.assertEqual(share_groups(True, positions)[4], tuple(range(7)))
+        self.assertEqual(share_groups('row', positions)[4], (3, 4, 5))
+        self.assertEqual(share_groups('col', positions)[4], (1, 4))
+        with self.assertRaises(AssertionError):
+            grid_positions(7, (2, 3))
+
+    def test_grid(self):
+        source = StreamSource((1, ) * 7, 50)
+        an = AnimFigMpl(source, plot_samples=50, backend='Agg', layout=(3, 3), sharex=True, sharey='row')
+        self.assertEqual(len(an.axes), 7)
+        self.assertEqual(len(an.fig.axes), 7)
+        an.fig.canvas.draw()
+        # x tick labels are only drawn on the last subplot of every column
+        labelled = [any(label.get_visible() and label.get_text() for label in ax.get_xticklabels()) for ax in an.axes]
+        self.assertEqual(labelled, [False, False, False, False, True, True, True])
+        an.stop(None)
+
+    def test_shared_rescale(self):
+        source = StreamSource((1, ) * 4, 50)
+        an = AnimFigMpl(source, plot_samples=50, backend='Agg', layout=(2, 2), sharex=True, sharey=True,
+                        rescale_interval=10)
+        redrawn = []
+        an._redraw_axes = redrawn.append
+        for i in range(1, 40):
+            for plot_num in range(4):
+                source.push(plot_num, i, ((plot_num + 1) * i, ))
+            rescales = len(redrawn)
+            an.update_plots(i)
+            if len(redrawn) > rescales:
+                # every rescale fits the data of all four subplots in this very frame
+                bottom, top = an.axes[0].get_ylim()
+                self.assertLess(bottom, 1)
+                self.assertGreaterEqual(top, 4 * i)
+        # the shared axes are redrawn as one group
+        self.assertTrue(redrawn)
+        self.assertTrue(all(len(axes) == 4 for axes in redrawn))
+        self.assertLessEqual(len(redrawn), 4)
+        an.stop(None)
+
+
+class TestFrameStats(unittest.TestCase):
+
+    def test_snapshot(self):
+        snapshots = []
+        stats = FrameStats(callback=snapshots.append, period=0)
+        for _ in range(11):
+            stats.start_frame()
+            stats.lap('data_function')
+            stats.add('draw', 0.002)
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot['frames'], 10)  # the last frame is still open
+        self.assertEqual(len(snapshots), 11)
+        self.assertGreater(snapshot['fps'], 0)
+        self.assertAlmostEqual(snapshot['stages']['draw']['p99'], 2)
+        self.assertEqual(snapshot['stages']['rescale']['max'], 0)
+        self.assertEqual(set(snapshot['stages']), set(FrameStats.STAGES))
+
+    def test_slowdown_warning(self):
+        an = AnimFigMpl(lambda i: return_multi(i=i, num_y=1, num_plots=1, x=[0, 1], y=[0, 1], maxpoints=2),
+                        plot_samples=2, backend='Agg')
+        stages = dict.fromkeys(FrameStats.STAGES, {'mean': 0.1})
+        for period, draw, warned in [(10., 0.1, False),  # paced by the GUI, not by the plotting work
+                                     (10., 9., True),
+                                     (0.9, 0.8, False)]:  # within the interval
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                an._print_stats({'fps': 1000 / period, 'frame_time': {'mean': period},
+                                 'stages': dict(stages, draw={'mean': draw})})
+            self.assertEqual('slowdown' in out.getvalue(), warned)
+        an.stop(None)
+
+    def test_threaded_data_function(self):
+        def data_function(i):
+            time.sleep(0.02)
+            return [([0., 1.], [0., float(i)])]
+
+        stats = FrameStats()
+        an = AnimFigMpl(data_function, plot_samples=2, backend='Agg', stats=stats)
+        an.producer = ProducerThread(data_function, interval=0)
+        an.producer.start()
+        for i in range(1, 6):
+            while not an.update_plots(i):
+                pass
+        an.producer.stop()
+        stats.start_frame()
+        # the time data_function took in the thread, not the time taken to pick the frame up
+        self.assertGreater(stats.snapshot()['stages']['data_function']['max'], 15)
+        an.stop(None)
+
+
+class TestExport(unittest.TestCase):
+
+    def test_png_sequence(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            an = make_export_figure()
+            self.assertEqual(an.export(os.path.join(tmp, 'frame_%03d.png'), range(1, 21)), 20)
+            self.assertEqual(sorted(os.listdir(tmp))[0], 'frame_001.png')
+            self.assertEqual(len(os.listdir(tmp)), 20)
+
+    def test_parallel(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            self.assertEqual(export(make_export_figure, os.path.join(tmp, 'frame_%03d.png'), range(1, 21), processes=2),
+                             20)
+            self.assertEqual(len(os.listdir(tmp)), 20)
+            if ffmpeg_available():
+                video = os.path.join(tmp, 'video.mp4')
+                self.assertEqual(export(make_export_figure, video, range(1, 21), processes=2), 20)
+                self.assertGreater(os.path.getsize(video), 0)
+
+    def test_parallel_matches_serial(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            outputs = {}
+            for name, processes, warmup in [('serial', 1, None), ('parallel', 2, None), ('cold', 2, 0)]:
+                os.mkdir(os.path.join(tmp, name))
+                export(make_export_figure, os.path.join(tmp, name, 'frame_%03d.png'), range(1, 101),
+                       processes=processes, warmup=warmup)
+                outputs[name] = [matplotlib.image.imread(os.path.join(tmp, name, f'frame_{i:03d}.png'))
+                                 for i in range(1, 101)]
+            for serial, parallel in zip(outputs['serial'], outputs['parallel']):
+                np.testing.assert_array_equal(serial, parallel)
+            # without warming up, the second chunk starts from fresh axes
+            self.assertFalse(all(np.array_equal(serial, cold) for serial, cold in zip(outputs['serial'],
+                                                                                      outputs['cold'])))
+
+
 class TestRescale(unittest.TestCase):
 
     maxpoints = int(1000)  # Slice up to 1000 points
@@ -36,11 +775,224 @@ class TestRescale(unittest.TestCase):
     y = list(np.cos(x))
 
     def test_x(self):
-        # TODO: Implement testing for x-axis rescaling in MPL backend only
-        pass
+        an = AnimFigMpl(lambda i: return_multi(i=i, num_y=1, num_plots=1, x=self.x, y=self.y, maxpoints=self.maxpoints),
+                        plot_samples=100, backend='Agg')
+        for i in range(1, 200):
+            an.update_plots(i)
+        # ticks are sample indices, labels are x values over a window of 100 samples
+        formatter = an.axes[0].xaxis.get_major_formatter()
+        self.assertEqual(float(formatter(0)), 0)
+        self.assertEqual(float(formatter(100)), float(f'{100 * (self.x[1] - self.x[0]):1.1}'))
+
+    def test_time_axis(self):
+        # non-uniform spacing must not matter, the lines are plotted against x itself
+        x = np.cumsum(np.random.default_rng(0).uniform(0.5, 2, self.maxpoints))
+        an = AnimFigMpl(lambda i: return_multi(i=i, num_y=1, num_plots=1, x=list(x), y=self.y, maxpoints=self.maxpoints),
+                        plot_samples=100, backend='Agg', time_axis=True)
+        for i in range(1, self.maxpoints):
+            an.update_plots(i)
+            x_min, x_max = an.axes[0].get_xlim()
+            self.assertTrue(x_min <= x[i - 1] <= x_max)
+            np.testing.assert_array_equal(an.live_plot[0][0].get_xdata()[-min(i, 100):], x[max(i - 100, 0):i])
+
     def test_y(self):
-        # TODO: Implement testing for y-axis rescaling in MPL backend only
-        pass
+        source = StreamSource((1, ), 50)
+        an = AnimFigMpl(source, plot_samples=50, backend='Agg', rescale_interval=1)
+        ax = an.axes[0]
+        source.push(0, range(50), (np.sin(np.arange(50)), ))
+        an.update_plots(1)
+        an.update_plots(2)
+        # data far outside the current limits
+        source.push(0, range(50, 100), (np.linspace(10, 20, 50), ))
+        an.update_plots(3)
+        self.assertEqual(ax.get_ylim(), (10 - 0.1 * 10, 20 + 0.1 * 10))
+        # small changes stay within the hysteresis and keep the limits
+        source.push(0, 100, (20.5, ))
+        an.update_plots(4)
+        self.assertEqual(ax.get_ylim(), (9, 21))
+        an.stop(None)
+
+    def test_redraw_only_rescaled_axes(self):
+        source = StreamSource((1, 1), 50)
+        an = AnimFigMpl(source, plot_samples=50, backend='Agg', rescale_interval=1)
+        canvas = an.fig.canvas
+        canvas.draw()
+        for i in range(1, 3):
+            source.push(0, i, (0., ))
+            source.push(1, i, (0., ))
+            an.update_plots(i)
+        blits, full_draws, axes_draws = [], [], []
+        canvas.blit = blits.append
+        canvas.draw_idle = lambda: full_draws.append(True)
+        for ax in an.axes:
+            ax.draw = lambda renderer, ax=ax: axes_draws.append(ax)
+        source.push(0, 3, (100., ))
+        an.update_plots(3)
+        self.assertEqual(full_draws, [])
+        self.assertEqual(axes_draws, [an.axes[0]])
+        bbox, = blits
+        renderer = canvas.get_renderer()
+        # the blitted region covers the rescaled axes and its labels, but not the other subplot
+        self.assertTrue(bbox.contains(*an.axes[0].get_tightbbox(renderer).get_points().mean(axis=0)))
+        self.assertLessEqual(bbox.x1, an.axes[1].get_window_extent(renderer).x0)
+        an.stop(None)
+
+    def test_calc_y_labels(self):
+        y_points = [self.y, [None] * (self.maxpoints - 1) + [2.]]
+        new_min_lim, new_max_lim = AnimFigMpl._calc_y_labels(y_points)
+        self.assertAlmostEqual(new_min_lim, -1 - 3 * 0.1)
+        self.assertAlmostEqual(new_max_lim, 2 + 3 * 0.1)
+        # Running extrema must give the same limits as scanning the data
+        buffers = [RingBuffer(self.maxpoints, track_extrema=True) for _ in y_points]
+        for buffer, y in zip(buffers, y_points):
+            buffer.extend(np.array(y, dtype=float))
+        self.assertEqual(AnimFigMpl._calc_y_labels(buffers), (new_min_lim, new_max_lim))
+        # Constant lines still get a non-zero range
+        new_min_lim, new_max_lim = AnimFigMpl._calc_y_labels([[1.] * 10])
+        self.assertGreater(new_max_lim, new_min_lim)
+
+
+class TestImport(unittest.TestCase):
+
+    def test_lazy(self):
+        # matplotlib must not be imported until a figure is created
+        code = ('import sys, src.AnimatedFigure, src.stream_source, src.shared_source; '
+                'print("matplotlib" in sys.modules)')
+        out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                             cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+        self.assertEqual(out.strip(), 'False')
+
+    def test_backend(self):
+        # An active non-interactive backend is kept
+        an = AnimFigMpl(lambda i: return_multi(i=i, num_y=1, num_plots=1, x=[0, 1], y=[0, 1], maxpoints=2),
+                        plot_samples=2)
+        self.assertIsNone(an.original_backend)
+        an.stop(None)
+
+    def test_unknown_backend(self):
+        with self.assertWarnsRegex(UserWarning, 'NoSuchBackend'), self.assertRaises(Exception):
+            AnimFigMpl(lambda i: return_multi(i=i, num_y=1, num_plots=1, x=[0, 1], y=[0, 1], maxpoints=2),
+                       plot_samples=2, backend='NoSuchBackend')
+
+
+class TestWeb(unittest.TestCase):
+
+    def test_messages(self):
+        payload = encode_message(REPLACE, 1, [1., 2., 3.], [[4., 5., 6.], [7., 8., np.nan]]) + \
+            encode_message(APPEND, 0, [4.], [[1.]])
+        self.assertEqual(len(payload) % 8, 0)
+        (kind, plot_num, x, y_lines), appended = decode_message(payload, (1, 2))
+        self.assertEqual((kind, plot_num), (REPLACE, 1))
+        np.testing.assert_array_equal(x, [1, 2, 3])
+        np.testing.assert_array_equal(y_lines, [[4, 5, 6], [7, 8, np.nan]])
+        self.assertEqual(appended[:2], (APPEND, 0))
+
+    def test_update(self):
+        source = StreamSource((2, 1), 100)
+        an = AnimFigWeb(source, plot_samples=100, interval=5, port=0)
+        viewer, late = FakeWriter(), FakeWriter()
+        an._viewers[viewer] = True
+        for i in range(1, 301):
+            source.push(0, i, (i, -i))
+            source.push(1, i, (i ** 2, ))
+            if i == 150:
+                an._viewers[late] = True
+            # a viewer that cannot keep up skips frames, then gets the whole window again
+            viewer.buffered = an.max_buffer + 1 if 200 <= i < 220 else 0
+            if i % 3 == 0:
+                an.update(i, an._read(i))
+                if any(an._viewers.values()):
+                    an._broadcast(None)
+        for writer in (viewer, late):
+            windows, kinds = writer.windows(an.lines_per_plot, an.plot_samples)
+            self.assertEqual(kinds[0], REPLACE)
+            self.assertIn(APPEND, kinds)
+            x, (y, ) = windows[1]
+            np.testing.assert_array_equal(x, np.arange(201, 301))
+            np.testing.assert_array_equal(y, np.arange(201, 301) ** 2)
+            x, (y_0, y_1) = windows[0]
+            np.testing.assert_array_equal(y_1, -x)
+        # only new samples are sent once a viewer is in sync
+        self.assertIsNone(an.update(301, an._read(301)))
+        source.push(1, 301, (0, ))
+        (kind, plot_num, x, _), = decode_message(read_ws_frame(io.BytesIO(an.update(302, an._read(302))).read)[1],
+                                                 an.lines_per_plot)
+        self.assertEqual((kind, plot_num, list(x)), (APPEND, 1, [301]))
+
+    def test_read_copies(self):
+        x, y = deque([0.], maxlen=10), deque([0.], maxlen=10)
+        lock = threading.Lock()
+
+        def data_function(i):
+            self.assertTrue(i == 0 or lock.locked())  # frame 0 only tells the figure the number of subplots
+            return [(x, y)]
+        an = AnimFigWeb(data_function, plot_samples=10, port=0, lock=lock)
+        (x_frame, y_frame), = an._read(1)
+        x.append(1.)  # the producer keeps writing, the frame does not change
+        np.testing.assert_array_equal(x_frame, [0])
+        (x_frame, y_frame), = an._read(2)
+        np.testing.assert_array_equal(x_frame, [0, 1])
+        np.testing.assert_array_equal(y_frame, [0])
+
+    def test_handshake(self):
+        an = AnimFigWeb(StreamSource((1, ), 10), plot_samples=10, port=8765, origins=['http://example.com:8080'])
+
+        def handle(request, *frames):
+            async def run():
+                reader = asyncio.StreamReader()
+                reader.feed_data(request + b''.join(frames))
+                reader.feed_eof()
+                writer = FakeWriter()
+                await an._handle(reader, writer)
+                return bytes(writer.data)
+            return asyncio.run(run())
+
+        def upgrade(origin=None):
+            return (b'GET / HTTP/1.1\r\nHost: localhost:8765\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n' +
+                    (b'Origin: ' + origin + b'\r\n' if origin else b'') +
+                    b'Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\nSec-WebSocket-Version: 13\r\n\r\n')
+        for origin, allowed in ((None, True), (b'http://localhost:8765', True), (b'http://127.0.0.1:8765/', True),
+                                (b'http://example.com:8080', True), (b'http://evil.com:8765', False),
+                                (b'http://localhost:8080', False), (b'null', False)):
+            with self.subTest(origin=origin):
+                response = handle(upgrade(origin))
+                if allowed:
+                    # RFC 6455 example key
+                    self.assertIn(b'Sec-WebSocket-Accept: s3pPLMBiTxaQ9kYGzzhZRbK+xOo=', response)
+                else:
+                    self.assertTrue(response.startswith(b'HTTP/1.1 403 Forbidden'))
+        # a masked ping is answered, an unmasked frame closes the connection with a protocol error
+        response = handle(upgrade(), masked_ws_frame(0x9, b'hi'), b'\x89\x00')
+        read = io.BytesIO(response[response.index(b'\r\n\r\n') + 4:]).read
+        self.assertEqual(read_ws_frame(read)[0], 0x1)  # configuration
+        self.assertEqual(read_ws_frame(read), (0xA, b'hi'))
+        self.assertEqual(read_ws_frame(read), (0x8, struct.pack('!H', 1002)))
+        # so do data frames and oversized control frames, whatever length they announce
+        for frame in (masked_ws_frame(0x2, b'data'), b'\x89\xff' + struct.pack('!Q', 2 ** 62)):
+            response = handle(upgrade(), frame)
+            self.assertTrue(response.endswith(b'\x88\x02' + struct.pack('!H', 1002)))  # close frame
+        # headers over the reader's limit are answered, not logged as an unhandled error
+        self.assertTrue(handle(b'GET / HTTP/1.1\r\nX: ' + b'a' * 2 ** 17 + b'\r\n\r\n').startswith(b'HTTP/1.1 431'))
+
+    def test_localhost(self):
+        an = AnimFigWeb(StreamSource((2, 1), 100), plot_samples=100, interval=5, port=0)
+        an.start()
+        with socket.create_connection((an.host, an.port), timeout=5) as page:
+            page.sendall(b'GET / HTTP/1.1\r\nHost: localhost\r\n\r\n')
+            self.assertTrue(page.recv(100).startswith(b'HTTP/1.1 200 OK'))
+        with socket.create_connection((an.host, an.port), timeout=5) as viewer:
+            key = base64.b64encode(os.urandom(16))
+            viewer.sendall(b'GET / HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                           b'Sec-WebSocket-Key: ' + key + b'\r\nSec-WebSocket-Version: 13\r\n\r\n')
+            response = b''
+            while not response.endswith(b'\r\n\r\n'):
+                response += viewer.recv(1)
+            self.assertIn(b'101 Switching Protocols', response)
+            opcode, config = read_ws_frame(socket_reader(viewer))
+            self.assertEqual(opcode, 0x1)
+            self.assertIn(b'"lines_per_plot": [2, 1]', config)
+        an.stop()
+        self.assertFalse(an._thread.is_alive())
 
 
 class TestQt(unittest.TestCase):
@@ -67,6 +1019,96 @@ class TestQt(unittest.TestCase):
                                     del self.an
 
 
+def push_samples(source, n):
+    for i in range(n):
+        source.push(0, i, (-i, i ** 2))
+        source.push(1, [i], ([i], ))
+    source.close()
+
+
+class FakeWriter:
+    """
+    Collects what AnimatedFigureWeb writes to a viewer, in place of an asyncio.StreamWriter and its transport.
+    """
+
+    def __init__(self):
+        self.data = bytearray()
+        self.buffered = 0  # bytes the transport reports as not sent yet
+        self.transport = self
+
+    def get_write_buffer_size(self):
+        return self.buffered
+
+    def write(self, data):
+        self.data += data
+
+    def close(self):
+        pass
+
+    def windows(self, lines_per_plot, plot_samples):
+        """
+        Replays the messages written like the web client does.
+        :return: {plot_num: (x, y_lines)}, [kind of every message]
+        """
+        windows, kinds = {}, []
+        read = io.BytesIO(bytes(self.data)).read
+        while True:
+            try:
+                opcode, payload = read_ws_frame(read)
+            except AssertionError:  # end of the data
+                return windows, kinds
+            if opcode != 0x2:
+                continue
+            for kind, plot_num, x, y_lines in decode_message(payload, lines_per_plot):
+                kinds.append(kind)
+                if kind == APPEND:
+                    old_x, old_y = windows[plot_num]
+                    new = x > old_x[-1]  # the client drops samples it already has
+                    x = np.concatenate((old_x, x[new]))
+                    y_lines = np.concatenate((old_y, y_lines[:, new]), axis=1)
+                windows[plot_num] = x[-plot_samples[plot_num]:], y_lines[:, -plot_samples[plot_num]:]
+
+
+def socket_reader(sock):
+    def read_exactly(n):
+        data = b''
+        while len(data) < n:
+            chunk = sock.recv(n - len(data))
+            if not chunk:
+                break
+            data += chunk
+        return data
+    return read_exactly
+
+
+def read_ws_frame(read):
+    # Unmasked frames, as sent by a WebSocket server. read(n) returns the next n bytes
+    def read_exactly(n):
+        data = read(n)
+        assert len(data) == n, "Connection closed."
+        return data
+    first, second = read_exactly(2)
+    n = second & 0x7F
+    if n == 126:
+        n, = struct.unpack('!H', read_exactly(2))
+    elif n == 127:
+        n, = struct.unpack('!Q', read_exactly(8))
+    return first & 0x0F, read_exactly(n)
+
+
+def masked_ws_frame(opcode, payload):
+    # Frames as sent by a browser, payload < 126 bytes
+    mask = os.urandom(4)
+    return bytes((0x80 | opcode, 0x80 | len(payload))) + mask + bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+
+
+def make_export_figure():
+    # Module level so it can be pickled for the process pool
+    x = [i / 100 * 2 * np.pi for i in range(200)]
+    return AnimFigMpl(lambda i: return_multi(i=i, num_y=2, num_plots=2, x=x, y=list(np.cos(x)), maxpoints=200),
+                      plot_samples=50, backend='Agg')
+
+
 def return_multi(i, x, y, num_y, num_plots, maxpoints):
     if i > maxpoints:
         raise StopIteration